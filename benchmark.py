@@ -0,0 +1,642 @@
+"""Reproducible benchmarks for the repo's modules on synthetic data.
+
+python benchmark.py --voters 10000 100000 --candidates 8 --depth 5 --skew 0 1.2
+python benchmark.py --suites word2vec takehome economies --output base.json
+python benchmark.py --suites word2vec takehome economies --baseline base.json
+
+Suites: rankedchoice (every voters, candidates, depth, skew, engine
+combination), word2vec (corpus preparation, training and similarity search
+by corpus size), takehome (medication scans, indexes, queries and the batch
+pipeline by medication count) and economies (humanitarian-aid cleaning,
+cached reload, ranking and outlier passes by country count). Each case runs
+warmup times untimed, then repeat times; the results are written as JSON
+(stdout or --output), one record per case and size with best wall time,
+throughput and optionally the traced peak memory. With --baseline, records
+are matched to a previous report and any that got slower (or, with --memory,
+bigger) by more than --threshold are listed under "regressions" and make
+the exit status 1.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from itertools import product
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+import rankedchoice
+import takehome
+import word2vec
+
+
+def loadEconomies():
+    """humanitarian-aid/main.py as a module; its directory isn't a package"""
+    path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "humanitarian-aid", "main.py"
+    )
+    spec = importlib.util.spec_from_file_location("economies", path)
+    module = importlib.util.module_from_spec(spec)
+    # registered so its objects (sketches, rankings) can be pickled
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+economies = loadEconomies()
+
+# record fields that are measurements rather than what was measured
+MEASUREMENTS = {
+    "seconds",
+    "items_per_second",
+    "ballots_per_second",  # rankedchoice records in older reports
+    "peak_traced_bytes",
+    "rounds",
+    "winner",
+}
+
+
+def generateBallots(
+    num_voters: int,
+    num_candidates: int,
+    depth: int,
+    skew: float = 0.0,
+    seed: int = 0,
+    chunk_size: int = 100_000,
+) -> List[List[int]]:
+    """Return num_voters ballots over candidate IDs 1..num_candidates, each
+    ranking between 1 and depth distinct candidates. skew=0 gives uniform
+    preferences; larger skew gives candidate k popularity 1/k**skew, so a few
+    orderings dominate like in real elections. Rankings are drawn without
+    replacement with the Gumbel top-k trick, chunk by chunk to bound memory"""
+    rng = np.random.default_rng(seed)
+    depth = min(depth, num_candidates)
+    log_weights = -skew * np.log(np.arange(1, num_candidates + 1))
+    ballots = []
+    for lo in range(0, num_voters, chunk_size):
+        n = min(chunk_size, num_voters - lo)
+        keys = log_weights + rng.gumbel(size=(n, num_candidates))
+        rankings = np.argsort(-keys, axis=1)[:, :depth] + 1
+        lengths = rng.integers(1, depth + 1, size=n)
+        ballots.extend(r[:k].tolist() for r, k in zip(rankings, lengths))
+    return ballots
+
+
+def generateCorpus(
+    num_words: int, vocab_size: int, skew: float = 1.0, seed: int = 0
+) -> str:
+    """Return num_words space separated words from a vocabulary of
+    vocab_size, word k drawn with probability proportional to 1/k**skew
+    (Zipf-like, as in natural text), with a sentence break every ~20 words"""
+    rng = np.random.default_rng(seed)
+    p = np.arange(1, vocab_size + 1) ** -skew
+    ids = rng.choice(vocab_size, size=num_words, p=p / p.sum())
+    words = [f"w{i}" for i in ids]
+    for i in range(19, num_words, 20):
+        words[i] += "."
+    return " ".join(words)
+
+
+def generateCMRRecord(
+    num_medications: int, fills_per_medication: int = 4, seed: int = 0
+) -> dict:
+    """Return a CMR record shaped like takehome.sample_data_obj with
+    num_medications medications over ~num_medications/4 distinct NDCs, each
+    with up to fills_per_medication fills between 2010 and 2015"""
+    rng = random.Random(seed)
+    groups = ["antihtn", "ccb", "acei", "statin", "diuretic", "antidiabetic", "nsaid"]
+    forms = ["tablet", "capsule", "tablet, extended release", "solution", "patch"]
+    num_ndcs = max(1, num_medications // 4)
+    medications = []
+    for _ in range(num_medications):
+        ndc = rng.randrange(num_ndcs)
+        days_supply = rng.choice(["30", "60", "90"])
+        start = date(2010, 1, 1) + timedelta(days=rng.randrange(5 * 365))
+        fills = []
+        for j in range(rng.randint(1, fills_per_medication)):
+            fill_date = start + timedelta(days=j * int(days_supply))
+            fills.append(
+                {
+                    "fillDate": fill_date.isoformat(),
+                    "daysSupply": days_supply,
+                    "quantity": days_supply,
+                }
+            )
+        strength = rng.choice(["5", "10", "20", "40"])
+        medications.append(
+            {
+                "ndc9": f"{ndc // 10_000:05d}-{ndc % 10_000:04d}",
+                "brandName": f"DRUG {ndc}",
+                "dosageStrength": strength,
+                "dosageUnit": "mg",
+                "doseForm": rng.choice(forms),
+                "drugGroup": rng.sample(groups, rng.randint(1, 2)),
+                "route": "oral",
+                "quantity": days_supply,
+                "daysSupply": days_supply,
+                "fills": fills,
+                "display": f"DRUG {ndc} {strength} MG",
+                "unitsPerDay": "1",
+                "dosePerDay": strength,
+            }
+        )
+    return {
+        "etlUpdated": "2016-01-01T00:00:00",
+        "id": f"synthetic-{seed}",
+        "medications": medications,
+        "resourceType": "CMR",
+    }
+
+
+def generateEconomies(
+    directory: str,
+    num_countries: int,
+    duplicate_rate: float = 0.01,
+    missing_rate: float = 0.01,
+    seed: int = 0,
+) -> Tuple[str, str]:
+    """Write economies1.csv and economies2.csv with the humanitarian-aid
+    columns for num_countries countries to directory, with duplicate_rate of
+    the rows repeated in both tables and missing_rate of the imports empty.
+    Returns the two paths"""
+    rng = np.random.default_rng(seed)
+    n = num_countries
+    countries = np.array([f"country{i}" for i in range(n)])
+    left = {
+        "country": countries,
+        "child_mort": rng.uniform(0.5, 20, n).round(1),
+        "health": rng.uniform(1, 12, n).round(1),
+        "income": rng.lognormal(9, 1, n).astype(int),
+        "inflation": rng.normal(4, 3, n).round(1),
+        "life_expec": rng.uniform(50, 85, n).round(1),
+        "total_fer": rng.uniform(1, 6, n).round(1),
+    }
+    exports = rng.integers(10, 10_000, n)
+    imports = (exports * rng.uniform(0.8, 1.3, n)).astype(int).astype(str)
+    imports[rng.random(n) < missing_rate] = ""
+    right = {
+        "country": countries,
+        "exports": exports,
+        "imports": imports,
+        "gdpp": left["income"],
+    }
+    duplicates = np.flatnonzero(rng.random(n) < duplicate_rate)
+    paths = []
+    for name, table in (("economies1.csv", left), ("economies2.csv", right)):
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(",".join(table) + "\n")
+            for i in np.concatenate([np.arange(n), duplicates]):
+                f.write(",".join(str(column[i]) for column in table.values()) + "\n")
+        paths.append(path)
+    return paths[0], paths[1]
+
+
+def timeCase(
+    run: Callable[[], object],
+    repeat: int,
+    warmup: int = 1,
+    trace_memory: bool = False,
+    setup: Optional[Callable[[], object]] = None,
+) -> dict:
+    """Best wall time of repeat calls to run after warmup untimed ones, with
+    setup (untimed) before each call, and the traced peak memory of one more
+    call when trace_memory"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        run()
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    record = {"seconds": min(times)}
+    if trace_memory:
+        # separate traced run so tracing overhead doesn't skew the timings
+        if setup:
+            setup()
+        tracemalloc.start()
+        run()
+        record["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return record
+
+
+def caseRecord(
+    suite: str, case: str, size: int, items: int, timing: dict, **params
+) -> dict:
+    record = {"suite": suite, "case": case, "size": size, **params, **timing}
+    record["items_per_second"] = items / timing["seconds"] if timing["seconds"] else 0.0
+    return record
+
+
+def runElection(
+    ballots: List[List[int]],
+    candidates: List[int],
+    engine: str,
+    repeat: int,
+    trace_memory: bool,
+    warmup: int = 0,
+) -> dict:
+    """Time one engine on one election with timeCase; the record also has
+    the winner and per-round stats of the last run"""
+    last = {}
+
+    def run():
+        last["rounds"] = []
+        last["winner"] = rankedchoice.rankedChoiceVoting(
+            ballots, candidates, engine=engine, on_round=last["rounds"].append
+        )
+
+    timing = timeCase(run, repeat, warmup, trace_memory)
+    return caseRecord(
+        "rankedchoice",
+        engine,
+        len(ballots),
+        len(ballots),
+        timing,
+        engine=engine,
+        winner=last["winner"],
+        rounds=last["rounds"],
+    )
+
+
+def benchmarkRankedChoice(
+    voters: List[int],
+    candidates: List[int],
+    depths: List[int],
+    skews: List[float],
+    engines: List[str],
+    repeat: int = 3,
+    seed: int = 0,
+    trace_memory: bool = False,
+    warmup: int = 0,
+) -> List[dict]:
+    results = []
+    for num_voters, num_candidates, depth, skew in product(
+        voters, candidates, depths, skews
+    ):
+        ballots = generateBallots(num_voters, num_candidates, depth, skew, seed)
+        candidate_ids = list(range(1, num_candidates + 1))
+        winners = set()
+        for engine in engines:
+            record = runElection(
+                ballots, candidate_ids, engine, repeat, trace_memory, warmup
+            )
+            record.update(
+                voters=num_voters, candidates=num_candidates, depth=depth, skew=skew
+            )
+            winners.add(record["winner"])
+            results.append(record)
+        if len(winners) > 1:
+            raise RuntimeError(f"engines disagree on winner: {winners}")
+    return results
+
+
+def benchmarkWord2Vec(
+    sizes: List[int],
+    vocab_size: int = 1000,
+    vector_length: int = 16,
+    iterations: int = 10,
+    repeat: int = 3,
+    seed: int = 0,
+    trace_memory: bool = False,
+    warmup: int = 1,
+) -> List[dict]:
+    """Corpus preparation, training and all-pairs similarity search for
+    corpora of each size in words"""
+    results = []
+    params = dict(vocab_size=vocab_size, vector_length=vector_length)
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_words in sizes:
+            path = os.path.join(tmp, f"corpus{num_words}.txt")
+            with open(path, "w") as f:
+                f.write(generateCorpus(num_words, vocab_size, seed=seed))
+            timing = timeCase(
+                lambda: word2vec.prepare_corpus(path), repeat, warmup, trace_memory
+            )
+            results.append(
+                caseRecord(
+                    "word2vec", "prepare_corpus", num_words, num_words, timing, **params
+                )
+            )
+            timing = timeCase(
+                lambda: word2vec.train_corpus(
+                    path, vector_length, iterations=iterations, seed=seed
+                ),
+                repeat,
+                warmup,
+                trace_memory,
+            )
+            results.append(
+                caseRecord(
+                    "word2vec",
+                    "train_corpus",
+                    num_words,
+                    num_words * iterations,
+                    timing,
+                    iterations=iterations,
+                    **params,
+                )
+            )
+            vectors = word2vec.train_corpus(
+                path, vector_length, iterations=1, seed=seed
+            )
+            index = word2vec.SimilarityIndex(vectors, metric="cosine")
+            timing = timeCase(index.all_most_similar, repeat, warmup, trace_memory)
+            results.append(
+                caseRecord(
+                    "word2vec",
+                    "all_most_similar",
+                    num_words,
+                    len(vectors),
+                    timing,
+                    vocab=len(vectors),
+                    **params,
+                )
+            )
+    return results
+
+
+def benchmarkTakehome(
+    sizes: List[int],
+    repeat: int = 3,
+    seed: int = 0,
+    trace_memory: bool = False,
+    warmup: int = 1,
+) -> List[dict]:
+    """Medication scans against their index/timeline counterparts, the query
+    API and the batch pipeline, for CMR records of each size in medications"""
+    results = []
+    query = takehome.Exact("drugGroup", "antihtn") & takehome.Partial(
+        "doseForm", "tablet"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_medications in sizes:
+            record = generateCMRRecord(num_medications, seed=seed)
+            index = takehome.MedicationIndex(record)
+            timeline = takehome.FillTimeline(record)
+            num_fills = sum(len(med["fills"]) for med in record["medications"])
+            cases = [
+                (
+                    "antihtn_scan",
+                    num_medications,
+                    lambda: takehome.get_antihtn_meds(record),
+                ),
+                (
+                    "index_build",
+                    num_medications,
+                    lambda: takehome.MedicationIndex(record),
+                ),
+                (
+                    "antihtn_indexed",
+                    num_medications,
+                    lambda: takehome.get_antihtn_meds(record, index),
+                ),
+                (
+                    "latest_ndc_scan",
+                    num_fills,
+                    lambda: takehome.get_latest_med_ndc(record),
+                ),
+                ("timeline_build", num_fills, lambda: takehome.FillTimeline(record)),
+                (
+                    "latest_ndc_timeline",
+                    num_fills,
+                    lambda: takehome.get_latest_med_ndc(record, timeline),
+                ),
+                (
+                    "query_scan",
+                    num_medications,
+                    lambda: takehome.query_medications(record, query),
+                ),
+                (
+                    "query_indexed",
+                    num_medications,
+                    lambda: takehome.query_medications(record, query, index, timeline),
+                ),
+            ]
+            for case, items, run in cases:
+                timing = timeCase(run, repeat, warmup, trace_memory)
+                results.append(
+                    caseRecord("takehome", case, num_medications, items, timing)
+                )
+            # batch: num_medications records of 10 medications each
+            path = os.path.join(tmp, f"records{num_medications}.ndjson")
+            with open(path, "w") as f:
+                for i in range(num_medications):
+                    f.write(json.dumps(generateCMRRecord(10, seed=seed + i)) + "\n")
+            output = os.path.join(tmp, "summaries.ndjson")
+            timing = timeCase(
+                lambda: takehome.process_cmr_files([path], output, workers=1),
+                repeat,
+                warmup,
+                trace_memory,
+            )
+            results.append(
+                caseRecord(
+                    "takehome",
+                    "process_cmr_files",
+                    num_medications,
+                    num_medications,
+                    timing,
+                )
+            )
+    return results
+
+
+def benchmarkEconomies(
+    sizes: List[int],
+    chunksize: int = economies.CHUNKSIZE,
+    repeat: int = 3,
+    seed: int = 0,
+    trace_memory: bool = False,
+    warmup: int = 1,
+) -> List[dict]:
+    """humanitarian-aid cleaning from scratch and from its cache, top-k
+    ranking and the sketch + flag outlier passes, for tables of each size in
+    countries"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_countries in sizes:
+            left, right = generateEconomies(tmp, num_countries, seed=seed)
+            cache_dir = os.path.join(tmp, "cache")
+            clean = os.path.join(tmp, "clean.csv")
+
+            def run():
+                return economies.run(left, right, clean, chunksize, cache_dir=cache_dir)
+
+            def dropCache():
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+            cache = economies.load_clean(left, right, cache_dir, clean, chunksize)
+
+            def chunks():
+                return economies.iter_cache_chunks(cache, chunksize)
+
+            sketches = economies.build_sketches(chunks())
+            cases = [
+                ("run_cold", run, dropCache),
+                ("run_cached", run, None),
+                ("top_k", lambda: economies.top_k(chunks()), None),
+                ("build_sketches", lambda: economies.build_sketches(chunks()), None),
+                (
+                    "flag_outliers",
+                    lambda: list(economies.flag_outliers(chunks(), sketches)),
+                    None,
+                ),
+            ]
+            for case, run_case, setup in cases:
+                timing = timeCase(run_case, repeat, warmup, trace_memory, setup)
+                results.append(
+                    caseRecord(
+                        "economies",
+                        case,
+                        num_countries,
+                        num_countries,
+                        timing,
+                        chunksize=chunksize,
+                    )
+                )
+    return results
+
+
+def recordKey(record: dict) -> str:
+    """What a record measured, for matching it across reports"""
+    return json.dumps(
+        {k: v for k, v in record.items() if k not in MEASUREMENTS}, sort_keys=True
+    )
+
+
+def compareToBaseline(
+    results: List[dict], baseline: List[dict], threshold: float = 0.1
+) -> List[dict]:
+    """Records of results slower than their baseline record, or with a larger
+    traced peak when both have one, by more than threshold (a fraction).
+    Records missing from the baseline are skipped"""
+    previous = {recordKey(record): record for record in baseline}
+    regressions = []
+    for record in results:
+        before = previous.get(recordKey(record))
+        if before is None:
+            continue
+        for measure in ("seconds", "peak_traced_bytes"):
+            if measure not in record or measure not in before:
+                continue
+            ratio = record[measure] / before[measure] if before[measure] else 1.0
+            if ratio > 1 + threshold:
+                regressions.append(
+                    {
+                        "suite": record.get("suite"),
+                        "case": record.get("case"),
+                        "size": record.get("size"),
+                        "measure": measure,
+                        "baseline": before[measure],
+                        "current": record[measure],
+                        "ratio": ratio,
+                    }
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--suites",
+        nargs="+",
+        default=["rankedchoice"],
+        choices=["rankedchoice", "word2vec", "takehome", "economies"],
+    )
+    parser.add_argument("--voters", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[8])
+    parser.add_argument("--depth", type=int, nargs="+", default=[5])
+    parser.add_argument("--skew", type=float, nargs="+", default=[0.0, 1.2])
+    parser.add_argument(
+        "--engines", nargs="+", default=["list", "array", "aggregate", "parallel"]
+    )
+    parser.add_argument("--words", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--vocab", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--medications", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--countries", type=int, nargs="+", default=[1000, 100_000])
+    parser.add_argument("--chunksize", type=int, default=economies.CHUNKSIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory", action="store_true", help="trace peak memory")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="allowed slowdown, 0.1 = 10%%"
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    if "rankedchoice" in args.suites:
+        results += benchmarkRankedChoice(
+            args.voters,
+            args.candidates,
+            args.depth,
+            args.skew,
+            args.engines,
+            args.repeat,
+            args.seed,
+            args.memory,
+            args.warmup,
+        )
+    if "word2vec" in args.suites:
+        results += benchmarkWord2Vec(
+            args.words,
+            args.vocab,
+            iterations=args.iterations,
+            repeat=args.repeat,
+            seed=args.seed,
+            trace_memory=args.memory,
+            warmup=args.warmup,
+        )
+    if "takehome" in args.suites:
+        results += benchmarkTakehome(
+            args.medications, args.repeat, args.seed, args.memory, args.warmup
+        )
+    if "economies" in args.suites:
+        results += benchmarkEconomies(
+            args.countries,
+            args.chunksize,
+            args.repeat,
+            args.seed,
+            args.memory,
+            args.warmup,
+        )
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        report["regressions"] = compareToBaseline(results, baseline, args.threshold)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,457 @@
 # Write your code here
-import pandas as pd 
-import pandas as pd 
-economies_df1 = pd.read_csv('economies1.csv')
-economies_df2 = pd.read_csv('economies2.csv')
+import copy
+import hashlib
+import heapq
+import json
+import os
+import pickle
+import shutil
+import tempfile
 
-economies_df = pd.merge(economies_df1, economies_df2, how = 'left', on = "country")
-#print(economies_df)
+import numpy as np
+import pandas as pd
 
-economies_df_duplicates = economies_df[economies_df.duplicated()]
-#print(economies_df_duplicates)
+LEFT_PATH = 'economies1.csv'
+RIGHT_PATH = 'economies2.csv'
+CLEAN_PATH = 'economies_clean.csv'
+CACHE_DIR = 'economies_clean.cache'
+CACHE_VERSION = 3
+KEY = 'country'
+IMPUTE_COLUMNS = ('imports',)
+CHUNKSIZE = 100_000
 
-economies_df = economies_df.drop_duplicates()
-#print(economies_df)
 
-economies_df_missing = economies_df[economies_df.isnull().any(axis = 1)] 
-#print(economies_df_missing)
+def normalized(chunk):
+    # numeric columns as float64, so a chunk whose ints became floats (from
+    # read_csv inference or rows the left join left unmatched) compares and
+    # hashes the same as one that kept them; text columns stay text
+    return chunk.astype({column: 'float64' for column in chunk.select_dtypes('number').columns})
 
-economies_df['imports'].fillna(economies_df['imports'].mean(), inplace = True)
-#print(economies_df)
 
+def merged_chunks(left_path, right_path, chunksize = CHUNKSIZE):
+    # left join the left table chunk by chunk against the right table, which
+    # is read once and hashed on the key by pd.merge
+    right_df = pd.read_csv(right_path)
+    for chunk in pd.read_csv(left_path, chunksize = chunksize):
+        yield pd.merge(chunk, right_df, how = 'left', on = KEY)
 
-Q1 = economies_df.quantile(0.25)
-Q3 = economies_df.quantile(0.75)
-IQR = Q3 - Q1
-economies_df_outliers = economies_df[((economies_df < (Q1 - 1.5 * IQR)) | (economies_df > (Q3 + 1.5 * IQR))).any(axis = 1)]
-#print(economies_df_outliers)
 
-economies_df.to_csv("economies_clean.csv", index = False) 
-final_df = pd.read_csv("economies_clean.csv")
-#print(final_df.head())
+def dedup_chunks(chunks):
+    # drop rows identical to any earlier row, remembering a 64-bit hash of
+    # every distinct row instead of the rows themselves; rows are hashed in
+    # normalized form so equal values match whatever dtype their chunk has
+    seen = set()
+    for chunk in chunks:
+        hashes = pd.util.hash_pandas_object(normalized(chunk), index = False).to_numpy()
+        keep = []
+        for h in hashes:
+            keep.append(h not in seen)
+            seen.add(h)
+        yield chunk[keep]
 
-financial_df = final_df.sort_values(by ='child_mort', ascending = False)
-financial_df = financial_df.head()
-print(financial_df)
+
+def clean_chunks(left_path = LEFT_PATH, right_path = RIGHT_PATH, chunksize = CHUNKSIZE,
+                 impute_columns = IMPUTE_COLUMNS):
+    # two pass cleaning with memory bounded by the chunk size: pass one
+    # merges, dedups, keeps a running sum/count per imputed column and
+    # spills the chunks to a temporary pickle stream; pass two reads them
+    # back and fills missing values with the column means
+    sums = dict.fromkeys(impute_columns, 0.)
+    counts = dict.fromkeys(impute_columns, 0)
+    with tempfile.TemporaryFile() as spill:
+        num_chunks = 0
+        for chunk in dedup_chunks(merged_chunks(left_path, right_path, chunksize)):
+            for column in impute_columns:
+                sums[column] += chunk[column].sum()
+                counts[column] += chunk[column].count()
+            pickle.dump(chunk, spill, protocol = pickle.HIGHEST_PROTOCOL)
+            num_chunks += 1
+        means = {column: sums[column] / counts[column] if counts[column] else float('nan')
+                 for column in impute_columns}
+        spill.seek(0)
+        for _ in range(num_chunks):
+            chunk = pickle.load(spill)
+            # floats throughout so every chunk writes the column the same way
+            yield chunk.astype({column: float for column in impute_columns}).fillna(means)
+
+
+def clean_in_memory(left_path = LEFT_PATH, right_path = RIGHT_PATH, impute_columns = IMPUTE_COLUMNS):
+    # the same cleaning on whole tables, to check clean_chunks against
+    economies_df = pd.merge(pd.read_csv(left_path), pd.read_csv(right_path), how = 'left', on = KEY)
+    economies_df = economies_df.drop_duplicates()
+    for column in impute_columns:
+        economies_df[column] = economies_df[column].fillna(economies_df[column].mean())
+    return economies_df
+
+
+class QuantileSketch:
+    # KLL style mergeable quantile sketch for one numeric column. Values sit in
+    # compactors; level h holds items standing for 2**h values each. When the
+    # sketch is over capacity the lowest full level is sorted and every other
+    # item (random offset) is promoted, so memory stays around 3k items no
+    # matter how many values are seen. Rank error is about 1.7/k of n with high
+    # probability (~1% at the default k=200) and is zero while n <= k.
+    # Sketches of the same column built in different processes can be pickled
+    # and combined with merge().
+
+    def __init__(self, k = 200, seed = None):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype = float)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.n += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self):
+        while sum(map(len, self.levels)) > sum(map(self.capacity, range(len(self.levels)))):
+            for level, items in enumerate(self.levels):
+                if len(items) >= self.capacity(level):
+                    break
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            # an odd item out stays behind so the promoted half is exact
+            keep = items[:len(items) % 2]
+            pairs = items[len(keep):]
+            promoted = pairs[self.rng.integers(2)::2]
+            self.levels[level] = keep
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def quantile(self, q):
+        # linear interpolation between items placed at the middle of the ranks
+        # they stand for, which matches pandas' default while nothing has been
+        # compacted
+        if self.n == 0:
+            return float('nan')
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2. ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind = 'stable')
+        items, weights = items[order], weights[order]
+        centers = np.cumsum(weights) - (weights + 1) / 2
+        total = weights.sum()
+        return float(np.interp(q * (total - 1), centers, items))
+
+
+def build_sketches(chunks, k = 200, seed = None, sketches = None):
+    # one pass over the chunks, one sketch per numeric column; pass sketches
+    # to keep adding to ones built earlier
+    sketches = {} if sketches is None else sketches
+    for chunk in chunks:
+        for column in chunk.select_dtypes('number').columns:
+            if column not in sketches:
+                sketches[column] = QuantileSketch(k, seed)
+            sketches[column].update(chunk[column].to_numpy())
+    return sketches
+
+
+def merge_sketches(*sketch_dicts):
+    merged = {}
+    for sketches in sketch_dicts:
+        for column, sketch in sketches.items():
+            if column in merged:
+                merged[column].merge(sketch)
+            else:
+                merged[column] = copy.deepcopy(sketch)
+    return merged
+
+
+def iqr_bounds(sketches, factor = 1.5):
+    # (low, high) fences per column from the sketched quartiles
+    bounds = {}
+    for column, sketch in sketches.items():
+        Q1 = sketch.quantile(0.25)
+        Q3 = sketch.quantile(0.75)
+        IQR = Q3 - Q1
+        bounds[column] = (Q1 - factor * IQR, Q3 + factor * IQR)
+    return bounds
+
+
+def flag_outliers(chunks, sketches, factor = 1.5):
+    # second streaming pass: yield the rows of each chunk with any sketched
+    # column outside its IQR fences
+    bounds = iqr_bounds(sketches, factor)
+    low = pd.Series({column: b[0] for column, b in bounds.items()})
+    high = pd.Series({column: b[1] for column, b in bounds.items()})
+    for chunk in chunks:
+        numeric_df = chunk[low.index]
+        yield chunk[((numeric_df < low) | (numeric_df > high)).any(axis = 1)]
+
+
+def score(chunk, by):
+    # a column name, or {column: weight} for a weighted sum of columns, e.g.
+    # {'child_mort': 1, 'income': -0.001, 'health': -1}; weights are applied to
+    # the raw values so they also set the scale of each column
+    if isinstance(by, str):
+        return chunk[by].to_numpy(dtype = float)
+    return sum(weight * chunk[column].to_numpy(dtype = float) for column, weight in by.items())
+
+
+class TopK:
+    # streaming top-k rows by score(chunk, by), largest first (or smallest with
+    # largest = False). Each chunk is narrowed with a partition to the rows that
+    # can make its own top k, ordered by (score, position) with one lexsort,
+    # and its best k go through a k sized min heap of (score, -order) keys, so
+    # ranking n rows costs O(n log k) however many scores tie. Only the k kept
+    # rows are held, taken from each chunk with a single iloc. Ties keep the
+    # earlier row, as DataFrame.nlargest does; NaN scores are never ranked, so
+    # fewer than k rows come back when fewer than k scores are valid
+
+    def __init__(self, k = 5, by = 'child_mort', largest = True):
+        self.k = k
+        self.by = by
+        self.sign = 1 if largest else -1
+        self.heap = []
+        self.rows = None
+        self.orders = np.empty(0, dtype = np.int64)
+        self.seen = 0
+
+    def _add(self, keys, orders, rows):
+        # keys and orders best first, rows the matching frame
+        for key, order in zip(keys.tolist(), orders.tolist()):
+            # later rows compare smaller, so they are evicted first on ties
+            item = (key, -order)
+            if len(self.heap) < self.k:
+                heapq.heappush(self.heap, item)
+            elif item > self.heap[0]:
+                heapq.heapreplace(self.heap, item)
+            else:
+                break  # the rest rank lower still
+        kept = np.array([-order for _, order in self.heap], dtype = np.int64)
+        new = np.isin(orders, kept)
+        if self.rows is None:
+            self.rows, self.orders = rows.iloc[np.flatnonzero(new)], orders[new]
+        else:
+            old = np.isin(self.orders, kept)
+            self.rows = pd.concat([self.rows.iloc[np.flatnonzero(old)], rows.iloc[np.flatnonzero(new)]])
+            self.orders = np.concatenate([self.orders[old], orders[new]])
+
+    def update(self, chunk):
+        keys = self.sign * score(chunk, self.by)
+        positions = np.flatnonzero(~np.isnan(keys))
+        if len(positions) > self.k:
+            threshold = np.partition(keys[positions], -self.k)[-self.k]
+            positions = positions[keys[positions] >= threshold]
+        positions = positions[np.lexsort((positions, -keys[positions]))[:self.k]]
+        self._add(keys[positions], positions + self.seen, chunk.iloc[positions])
+        self.seen += len(chunk)
+        return self
+
+    def merge(self, other):
+        # other must rank by the same score over rows that came after ours
+        if self.rows is None and other.rows is not None:
+            self.rows = other.rows.iloc[:0]
+        if other.heap:
+            ranked = sorted(other.heap, reverse = True)
+            keys = np.array([key for key, _ in ranked])
+            orders = np.array([-order for _, order in ranked], dtype = np.int64)
+            where = {order: i for i, order in enumerate(other.orders.tolist())}
+            rows = other.rows.iloc[[where[order] for order in orders.tolist()]]
+            self._add(keys, orders + self.seen, rows)
+        self.seen += other.seen
+        return self
+
+    def result(self):
+        # the ranked rows; empty with the input's columns when nothing ranked
+        if not self.heap:
+            return pd.DataFrame() if self.rows is None else self.rows.iloc[:0]
+        where = {order: i for i, order in enumerate(self.orders.tolist())}
+        return self.rows.iloc[[where[-order] for _, order in sorted(self.heap, reverse = True)]]
+
+
+def top_k(chunks, k = 5, by = 'child_mort', largest = True):
+    # top k rows of a DataFrame or an iterable of chunks
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    ranking = TopK(k, by, largest)
+    for chunk in chunks:
+        ranking.update(chunk)
+    return ranking.result()
+
+
+def input_key(*paths):
+    # sha256 over the contents of the input files, the cache format and the
+    # cleaning settings, so any change to them invalidates the cache
+    digest = hashlib.sha256(f'{CACHE_VERSION} {KEY} {IMPUTE_COLUMNS}'.encode())
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _append_column(directory, i, column, values):
+    # numeric columns go to <i>.bin as raw values, promoted in place if a later
+    # chunk needs a wider dtype; anything else is stored as utf-8 bytes in
+    # <i>.bin with int64 end offsets in <i>.off and a missing mask in <i>.na
+    path = os.path.join(directory, f'{i}.bin')
+    if values.dtype.kind in 'biuf' and column.get('dtype') != 'str':
+        dtype = np.result_type(column.get('dtype', values.dtype), values.dtype)
+        if 'dtype' in column and dtype != np.dtype(column['dtype']):
+            np.fromfile(path, column['dtype']).astype(dtype).tofile(path)
+        column['dtype'] = dtype.str
+        with open(path, 'ab') as f:
+            values.astype(dtype).tofile(f)
+        return
+    if column.get('dtype', 'str') != 'str':
+        raise TypeError(f"column {column['name']} changed from numbers to text")
+    column['dtype'] = 'str'
+    missing = pd.isna(values)
+    encoded = [b'' if na else str(value).encode() for value, na in zip(values, missing)]
+    ends = np.cumsum([len(value) for value in encoded], dtype = np.int64) + column.get('bytes', 0)
+    column['bytes'] = int(ends[-1]) if len(ends) else column.get('bytes', 0)
+    with open(path, 'ab') as f:
+        f.write(b''.join(encoded))
+    with open(os.path.join(directory, f'{i}.off'), 'ab') as f:
+        ends.tofile(f)
+    with open(os.path.join(directory, f'{i}.na'), 'ab') as f:
+        missing.astype(np.bool_).tofile(f)
+
+
+def build_cache(left_path = LEFT_PATH, right_path = RIGHT_PATH, cache_dir = CACHE_DIR, clean_path = CLEAN_PATH,
+                chunksize = CHUNKSIZE):
+    # run the cleaning pipeline once into a columnar cache: one raw file per
+    # column that open_cache maps back without parsing. Written to a temporary
+    # directory and swapped in with meta.json last, so a crash leaves either
+    # the old cache or none. The cleaned csv is still written when clean_path
+    # is given
+    key = input_key(left_path, right_path)
+    tmp = cache_dir + '.tmp'
+    shutil.rmtree(tmp, ignore_errors = True)
+    os.makedirs(tmp)
+    columns = None
+    rows = 0
+    out = open(clean_path, 'w', newline = '') if clean_path else None
+    try:
+        for chunk in clean_chunks(left_path, right_path, chunksize):
+            if columns is None:
+                columns = [{'name': name} for name in chunk.columns]
+            for i, column in enumerate(columns):
+                _append_column(tmp, i, column, chunk[column['name']].to_numpy())
+            if out:
+                chunk.to_csv(out, header = rows == 0, index = False)
+            rows += len(chunk)
+    finally:
+        if out:
+            out.close()
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'key': key, 'rows': rows, 'columns': columns or []}, f)
+    shutil.rmtree(cache_dir, ignore_errors = True)
+    os.replace(tmp, cache_dir)
+    return key
+
+
+def open_cache(cache_dir = CACHE_DIR, key = None):
+    # {column: memmap} for numeric columns and (bytes, ends, missing) memmaps
+    # for text, plus the row count; None when there is no cache or its key
+    # doesn't match
+    try:
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    if key is not None and meta['key'] != key:
+        return None
+
+    def mapped(name, dtype):
+        path = os.path.join(cache_dir, name)
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype)
+        return np.memmap(path, dtype = dtype, mode = 'r')
+
+    columns = {}
+    for i, column in enumerate(meta['columns']):
+        if column['dtype'] == 'str':
+            columns[column['name']] = (mapped(f'{i}.bin', np.uint8), mapped(f'{i}.off', np.int64),
+                                       mapped(f'{i}.na', np.bool_))
+        else:
+            columns[column['name']] = mapped(f'{i}.bin', column['dtype'])
+    return columns, meta['rows']
+
+
+def iter_cache_chunks(cache, chunksize = CHUNKSIZE):
+    # DataFrames of up to chunksize rows from an open_cache result, indexed by
+    # row position; numeric columns are sliced straight from the memmaps
+    columns, rows = cache
+    for lo in range(0, rows, chunksize):
+        hi = min(lo + chunksize, rows)
+        data = {}
+        for name, column in columns.items():
+            if isinstance(column, tuple):
+                flat, ends, missing = column
+                start = int(ends[lo - 1]) if lo else 0
+                text = flat[start:int(ends[hi - 1])].tobytes()
+                bounds = np.concatenate([[0], ends[lo:hi] - start]).tolist()
+                data[name] = pd.Series([None if missing[lo + j] else text[a:b].decode()
+                                        for j, (a, b) in enumerate(zip(bounds, bounds[1:]))],
+                                       dtype = object, index = range(lo, hi))
+            else:
+                data[name] = pd.Series(column[lo:hi], index = range(lo, hi))
+        yield pd.DataFrame(data)
+
+
+def load_clean(left_path = LEFT_PATH, right_path = RIGHT_PATH, cache_dir = CACHE_DIR, clean_path = CLEAN_PATH,
+               chunksize = CHUNKSIZE):
+    # the open cache for these inputs, cleaning them first if it is missing
+    # or stale
+    key = input_key(left_path, right_path)
+    cache = open_cache(cache_dir, key)
+    if cache is None:
+        build_cache(left_path, right_path, cache_dir, clean_path, chunksize)
+        cache = open_cache(cache_dir, key)
+    return cache
+
+
+def run(left_path = LEFT_PATH, right_path = RIGHT_PATH, clean_path = CLEAN_PATH, chunksize = CHUNKSIZE, top = 5,
+        by = 'child_mort', cache_dir = CACHE_DIR, seed = 0):
+    # clean into the columnar cache (skipped when the inputs are unchanged),
+    # then rank and sketch the cached chunks in one pass; returns the top rows
+    # by `by` (see score), the column sketches and the open cache for later
+    # passes. seed fixes the sketches' compaction choices, so the outlier
+    # fences are the same on every run
+    cache = load_clean(left_path, right_path, cache_dir, clean_path, chunksize)
+    ranking = TopK(top, by)
+    sketches = {}
+    for chunk in iter_cache_chunks(cache, chunksize):
+        build_sketches([chunk], seed = seed, sketches = sketches)
+        ranking.update(chunk)
+    return ranking.result(), sketches, cache
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    # chunked cleaning must match the in-memory one, including duplicates
+    # split across chunks that differ in which keys the join matched
+    with tempfile.TemporaryDirectory() as tmp:
+        left = os.path.join(tmp, 'left.csv')
+        right = os.path.join(tmp, 'right.csv')
+        with open(left, 'w') as f:
+            f.write('country,region,child_mort\nIndia,Asia,4.3\nNowhere,,1.0\nIndia,Asia,4.3\nChina,Asia,2.2\n'
+                    'India,Asia,4.3\n')
+        with open(right, 'w') as f:
+            f.write('country,exports,imports\nIndia,500,600\nChina,1000,\n')
+        chunked = normalized(pd.concat(clean_chunks(left, right, chunksize = 2))).reset_index(drop = True)
+        assert chunked.equals(normalized(clean_in_memory(left, right)).reset_index(drop = True)), chunked
+    financial_df, sketches, cache = run()
+    economies_df_outliers = pd.concat(flag_outliers(iter_cache_chunks(cache), sketches))
+    #print(economies_df_outliers)
+    print(financial_df)
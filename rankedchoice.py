@@ -1,4 +1,21 @@
-from typing import Optional, List
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Hashable, Iterable, Iterator, Optional, List, Tuple
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
 """
 ballot : [1, 2, 3], [2, 3]
@@ -66,12 +83,60 @@ def findMinAndMaxVoterLists(
     return min_vote_ids, max_vote_ids, min_vote_number, max_vote_number
 
 
+def roundStats(
+    round_number: int,
+    round_start: float,
+    reassigned: int,
+    skipped: int,
+    remaining_candidates: int,
+) -> dict:
+    """Build the record passed to an on_round hook after an elimination:
+    wall time of the round, ballots moved off eliminated candidates, extra
+    ballot entries skipped because they named eliminated candidates too,
+    and peak resident memory of the process so far (bytes)"""
+    return {
+        "round": round_number + 1,
+        "seconds": time.perf_counter() - round_start,
+        "reassigned": reassigned,
+        "skipped": skipped,
+        "remaining_candidates": remaining_candidates,
+        "peak_rss_bytes": _peakRss(),
+    }
+
+
+def _peakRss() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
 def rankedChoiceVoting(
-    ballots: List[int], candidates: Optional[List[int]] = [1, 2, 3, 4, 5, 6]
+    ballots: List[int],
+    candidates: Optional[List[int]] = [1, 2, 3, 4, 5, 6],
+    engine: str = "list",
+    on_round: Optional[Callable[[dict], None]] = None,
 ) -> Optional[int]:
     """implement ranked choice, taking into account empty ballots
     and multiple votes on one ballot, return ID of winner or None.
+    engine="array" packs the ballots into a BallotStore and tallies with
+    NumPy (see rankedChoiceVotingArray), engine="parallel" shards that
+    tally across processes (see rankedChoiceVotingParallel) and
+    engine="aggregate" tallies each distinct ranking once, weighted by its
+    voter count (see rankedChoiceVotingAggregated); the winner is the same
+    either way.
+    A BallotStore (e.g. from ingestBallots) always uses the array engine.
+    on_round, if given, is called with roundStats after every elimination.
     Overall complexity O(M*(N+B) + N*B + M^2)"""
+    if engine == "parallel":
+        return rankedChoiceVotingParallel(ballots, candidates, on_round=on_round)
+    elif engine == "aggregate":
+        return rankedChoiceVotingAggregated(ballots, candidates, on_round=on_round)
+    elif engine == "array" or isinstance(ballots, BallotStore):
+        return rankedChoiceVotingArray(ballots, candidates, on_round=on_round)
+    elif engine != "list":
+        raise ValueError(f"unknown engine: {engine}")
     sanitized_ballots = sanitizeBallots(ballots)  # O(N*B)
     # print(f"sanitized_ballots for this run: {sanitized_ballots}")
     if sanitized_ballots is None:
@@ -84,6 +149,7 @@ def rankedChoiceVoting(
     cur_num_votes = len(sanitized_ballots)
     # Begin voting round loop, up to M times for M candidates
     for round_number in range(len(candidates)):  # O(M*(B+M+N))
+        round_start = time.perf_counter()
         # print(f"starting voting round {round_number+1}:\n")
         # print(f"current top votes dict: {cur_first_choice_votes}")
 
@@ -116,6 +182,7 @@ def rankedChoiceVoting(
                 voter_ids_to_reassign.extend(cur_first_choice_votes[min_id])
                 del cur_first_choice_votes[min_id]
 
+            skipped = 0
             for vid in voter_ids_to_reassign:  # O(N)
                 del sanitized_ballots[vid][-1]
                 # If the current voter's next votes were for eliminated candidates,
@@ -126,6 +193,7 @@ def rankedChoiceVoting(
                     and sanitized_ballots[vid][-1] not in cur_first_choice_votes
                 ):  # O(B)
                     del sanitized_ballots[vid][-1]
+                    skipped += 1
                 if len(sanitized_ballots[vid]) > 0:
                     vid_next_best_choice = sanitized_ballots[vid][-1]
                     cur_first_choice_votes[vid_next_best_choice].append(vid)
@@ -135,16 +203,718 @@ def rankedChoiceVoting(
             for voter_ids in cur_first_choice_votes.values():  # O(M)
                 remaining_votes += len(voter_ids)
             cur_num_votes = remaining_votes
+            if on_round is not None:
+                on_round(
+                    roundStats(
+                        round_number,
+                        round_start,
+                        len(voter_ids_to_reassign),
+                        skipped,
+                        len(cur_first_choice_votes),
+                    )
+                )
     # If we get here, that means no one won after num_candidates rounds, so no one wins
     return None
 
 
-test_ballots_1 = [[1], [1], [2], [2], [], [3, 4, 5], [5, 5, 4, 4, 3, 4]]
-test_ballots_2 = [[1], [1], [2], [], [3, 4, 5]]
-test_ballots_3 = [[]]
-test_run_1 = rankedChoiceVoting(test_ballots_1)
-test_run_2 = rankedChoiceVoting(test_ballots_2)
-test_run_3 = rankedChoiceVoting(test_ballots_3)
-print(f"test 1, expected: None, actual: {test_run_1}\n")
-print(f"test 2, expected: 1,    actual: {test_run_2}\n")
-print(f"test 3, expected: None, actual: {test_run_3}\n")
+class BallotStore:
+    """Sanitized ballots packed into one flat int32 buffer of dense candidate
+    indices (first choice first), with offsets[i]:offsets[i+1] holding ballot
+    i. Candidate IDs are mapped to indices 0..K-1 in order of first sight.
+    Costs 4 bytes per vote plus 8 bytes per ballot instead of a list per
+    ballot and an int object per vote"""
+
+    def __init__(self):
+        self.candidate_ids: List[Hashable] = []  # dense index -> candidate ID
+        self.candidate_index: dict = {}  # candidate ID -> dense index
+        self._flat = array("i")
+        self._offsets = array("q", [0])
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def candidate_position(self, candidate: Hashable) -> int:
+        """Return dense index of candidate, registering it if unseen"""
+        pos = self.candidate_index.get(candidate)
+        if pos is None:
+            pos = len(self.candidate_ids)
+            self.candidate_index[candidate] = pos
+            self.candidate_ids.append(candidate)
+        return pos
+
+    def add_ballots(self, ballots: Iterable[List[int]]) -> int:
+        """Sanitize ballots the same way as sanitizeBallots (drop empty
+        ballots and repeated votes) and append them, return number kept.
+        O(N * B)"""
+        flat = array("i")
+        ends = array("q")
+        base = self.num_votes()
+        index = self.candidate_index
+        for b in ballots:
+            if len(b) == 0:
+                continue
+            # dict.fromkeys keeps first occurrence order while dropping repeats
+            for c in dict.fromkeys(b):
+                pos = index.get(c)
+                if pos is None:
+                    pos = self.candidate_position(c)
+                flat.append(pos)
+            ends.append(base + len(flat))
+        self._append(flat, ends)
+        return len(ends)
+
+    def num_votes(self) -> int:
+        return len(self._flat)
+
+    def _append(self, flat: array, ends: array) -> None:
+        """Store one sanitized chunk; ends are absolute ballot end offsets"""
+        self._flat.extend(flat)
+        self._offsets.extend(ends)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (flat, offsets) as zero-copy NumPy views; the views pin the
+        underlying buffers, so drop them before adding more ballots"""
+        flat = np.frombuffer(self._flat, dtype=np.int32)
+        offsets = np.frombuffer(self._offsets, dtype=np.int64)
+        return flat, offsets
+
+
+class DiskBallotStore(BallotStore):
+    """BallotStore kept in a directory instead of memory: flat.i32 and
+    offsets.i64 are raw little-endian arrays appended chunk by chunk, and
+    candidates.json maps dense indices back to candidate IDs. arrays()
+    memory-maps the files, so tallying never loads them whole. Opening an
+    existing directory resumes the store. Appends write candidates.json
+    (atomically), then flat.i32, then offsets.i64, and opening truncates
+    flat.i32 to the last recorded offset, so a crash mid-append loses at
+    most that chunk and never leaves a partial ballot"""
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._flat_path = os.path.join(directory, "flat.i32")
+        self._offsets_path = os.path.join(directory, "offsets.i64")
+        self._candidates_path = os.path.join(directory, "candidates.json")
+        if not os.path.exists(self._offsets_path):
+            with open(self._offsets_path, "wb") as f:
+                f.write(np.zeros(1, dtype="<i8").tobytes())
+            open(self._flat_path, "wb").close()
+        if os.path.exists(self._candidates_path):
+            with open(self._candidates_path) as f:
+                for c in json.load(f):
+                    self.candidate_position(c)
+        self._recover()
+
+    def _recover(self) -> None:
+        """Drop whatever a crashed append left past the last whole ballot"""
+        size = os.path.getsize(self._offsets_path)
+        if size % 8:
+            os.truncate(self._offsets_path, size - size % 8)
+        with open(self._offsets_path, "rb") as f:
+            f.seek(-8, os.SEEK_END)
+            end = int(np.frombuffer(f.read(8), dtype="<i8")[0])
+        if os.path.getsize(self._flat_path) > 4 * end:
+            os.truncate(self._flat_path, 4 * end)
+
+    def __len__(self) -> int:
+        return os.path.getsize(self._offsets_path) // 8 - 1
+
+    def num_votes(self) -> int:
+        return os.path.getsize(self._flat_path) // 4
+
+    def _append(self, flat: array, ends: array) -> None:
+        # candidates first, so every stored index has an ID, and offsets
+        # last, so they never point past the votes on disk
+        tmp = self._candidates_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.candidate_ids, f)
+        os.replace(tmp, self._candidates_path)
+        with open(self._flat_path, "ab") as f:
+            f.write(np.frombuffer(flat, dtype=np.int32).astype("<i4").tobytes())
+        with open(self._offsets_path, "ab") as f:
+            f.write(np.frombuffer(ends, dtype=np.int64).astype("<i8").tobytes())
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (flat, offsets) as read-only memory maps of the store files"""
+        if self.num_votes() == 0:
+            flat = np.zeros(0, dtype=np.int32)
+        else:
+            flat = np.memmap(self._flat_path, dtype="<i4", mode="r")
+        offsets = np.memmap(self._offsets_path, dtype="<i8", mode="r")
+        return flat, offsets
+
+
+def _parseVote(token, source: str, line_number: int) -> int:
+    """Validate one vote read from a file, which must be an integer ID"""
+    if isinstance(token, str):
+        try:
+            return int(token)
+        except ValueError:
+            pass
+    elif isinstance(token, int) and not isinstance(token, bool):
+        return token
+    raise ValueError(f"{source}:{line_number}: invalid vote {token!r}")
+
+
+def _readBallotFile(path: str) -> Iterator[List[int]]:
+    """Yield ballots one by one from a .jsonl file (one JSON list per line),
+    a .json file (one JSON array of lists, parsed whole) or a CSV file (one
+    comma-separated row per ballot, empty row for an empty ballot). Except
+    for .json, only the current line is held in memory"""
+    if path.endswith(".jsonl"):
+        with open(path) as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                ballot = json.loads(line)
+                if not isinstance(ballot, list):
+                    raise ValueError(f"{path}:{line_number}: ballot is not a list")
+                yield [_parseVote(v, path, line_number) for v in ballot]
+    elif path.endswith(".json"):
+        with open(path) as f:
+            ballots = json.load(f)
+        if not isinstance(ballots, list):
+            raise ValueError(f"{path}: expected a JSON array of ballots")
+        for number, ballot in enumerate(ballots, 1):
+            if not isinstance(ballot, list):
+                raise ValueError(f"{path}:{number}: ballot is not a list")
+            yield [_parseVote(v, path, number) for v in ballot]
+    else:
+        with open(path, newline="") as f:
+            for line_number, row in enumerate(csv.reader(f), 1):
+                yield [
+                    _parseVote(v.strip(), path, line_number) for v in row if v.strip()
+                ]
+
+
+def readBallotChunks(source, chunk_size: int = 100_000) -> Iterator[List[List[int]]]:
+    """Yield lists of at most chunk_size ballots from a file path (CSV,
+    JSONL or JSON) or from any iterable of ballots, so the full input is never
+    materialized"""
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    if isinstance(source, (str, os.PathLike)):
+        ballots = _readBallotFile(os.fspath(source))
+    else:
+        ballots = iter(source)
+    while True:
+        chunk = list(islice(ballots, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ingestBallots(
+    source,
+    store: Optional[BallotStore] = None,
+    chunk_size: int = 100_000,
+) -> BallotStore:
+    """Stream ballots from source into store chunk by chunk, sanitizing as
+    they arrive. Defaults to a new in-memory BallotStore; pass a
+    DiskBallotStore to keep the packed ballots on disk. The returned store
+    can be passed straight to rankedChoiceVoting. Memory is O(chunk_size * B)
+    on top of the store itself"""
+    if store is None:
+        store = BallotStore()
+    for chunk in readBallotChunks(source, chunk_size):
+        store.add_ballots(chunk)
+    return store
+
+
+def _toBallotStore(ballots) -> BallotStore:
+    if isinstance(ballots, BallotStore):
+        return ballots
+    store = BallotStore()
+    store.add_ballots(ballots)  # O(N*B)
+    return store
+
+
+def _advanceCursors(
+    flat: np.ndarray,
+    ends: np.ndarray,
+    cursor: np.ndarray,
+    live: np.ndarray,
+    active: np.ndarray,
+    stats: Optional[dict] = None,
+) -> np.ndarray:
+    """Advance the cursor of every live ballot sitting on an inactive
+    candidate until it reaches an active one or runs out, one vectorized
+    step per skipped vote. Return the ballots that landed on a new choice.
+    If stats is given, add the ballots reassigned and entries skipped"""
+    moving = live[~active[flat[cursor[live]]]]
+    if stats is not None:
+        stats["reassigned"] += len(moving)
+        stats["skipped"] -= len(moving)  # first step is the eliminated choice
+    moved = []
+    while len(moving) > 0:
+        if stats is not None:
+            stats["skipped"] += len(moving)
+        cursor[moving] += 1
+        moving = moving[cursor[moving] < ends[moving]]
+        landed = active[flat[cursor[moving]]]
+        moved.append(moving[landed])
+        moving = moving[~landed]
+    if moved:
+        return np.concatenate(moved)
+    return moving
+
+
+def _roundDecision(
+    counts: np.ndarray, active: np.ndarray, cur_num_votes: int
+) -> Tuple[Optional[int], Optional[np.ndarray]]:
+    """One round of findMinAndMaxVoterLists over dense candidate indices.
+    Return (winner, None) when the round ends the election, with winner None
+    for a full tie, or (None, eliminated) with the indices to eliminate"""
+    active_pos = np.flatnonzero(active)
+    if len(active_pos) == 1:
+        return active_pos[0], None
+
+    active_counts = counts[active_pos]
+    max_vote_number = active_counts.max()
+    min_vote_number = active_counts.min()
+    if max_vote_number > (cur_num_votes / 2):
+        return active_pos[active_counts.argmax()], None
+    elif max_vote_number == min_vote_number:
+        return None, None
+    return None, active_pos[active_counts == min_vote_number]
+
+
+def _initialActive(counts: np.ndarray, candidate_pos: List[int]) -> np.ndarray:
+    """Same starting field as initialVoteCount: given candidates plus anyone
+    who is a first choice; every other ID counts as already eliminated"""
+    active = counts > 0
+    active[candidate_pos] = True
+    return active
+
+
+def _tallyRounds(
+    candidate_ids: List[Hashable],
+    candidate_pos: List[int],
+    counts: np.ndarray,
+    cur_num_votes: int,
+    reassign,
+    on_round: Optional[Callable[[dict], None]] = None,
+) -> Optional[int]:
+    """Elimination rounds shared by the array engines. counts holds the
+    first choice tally per dense candidate index; reassign(active, stats)
+    moves ballots off candidates no longer active, adds to stats' reassigned
+    and skipped counters, and returns the tally of their new choices plus
+    the number of ballots still counting"""
+    active = _initialActive(counts, candidate_pos)
+    for round_number in range(len(candidate_pos)):
+        round_start = time.perf_counter()
+        winner, eliminated = _roundDecision(counts, active, cur_num_votes)
+        if eliminated is None:
+            return None if winner is None else candidate_ids[winner]
+
+        active[eliminated] = False
+        counts[eliminated] = 0
+        stats = {"reassigned": 0, "skipped": 0}
+        moved_counts, cur_num_votes = reassign(active, stats)
+        counts += moved_counts
+        if on_round is not None:
+            on_round(
+                roundStats(
+                    round_number,
+                    round_start,
+                    stats["reassigned"],
+                    stats["skipped"],
+                    int(active.sum()),
+                )
+            )
+    return None
+
+
+def _countChoices(
+    choices: np.ndarray, weights: Optional[np.ndarray], num_candidates: int
+) -> np.ndarray:
+    """Tally choices per dense candidate index, each counted weight times.
+    Float bincount sums are exact for totals below 2**53"""
+    if weights is None:
+        return np.bincount(choices, minlength=num_candidates)
+    counts = np.bincount(choices, weights=weights, minlength=num_candidates)
+    return counts.astype(np.int64)
+
+
+def rankedChoiceVotingArray(
+    ballots,
+    candidates: Optional[List[int]] = [1, 2, 3, 4, 5, 6],
+    weights: Optional[np.ndarray] = None,
+    on_round: Optional[Callable[[dict], None]] = None,
+) -> Optional[int]:
+    """Array-backed equivalent of rankedChoiceVoting. ballots is either a
+    list of ballots or an already filled BallotStore. Each ballot keeps a
+    cursor into the flat buffer instead of deleting eliminated votes, and the
+    tally is a bincount over current choices that is updated only with the
+    ballots moved off eliminated candidates each round. weights optionally
+    counts ballot i weights[i] times (see aggregateBallots).
+    Overall complexity O(N*B) with every round a vectorized pass"""
+    store = _toBallotStore(ballots)
+    if len(store) == 0:
+        return None
+    if weights is not None and len(weights) != len(store):
+        raise ValueError("weights must have one entry per ballot")
+    candidate_pos = [store.candidate_position(c) for c in candidates]
+    num_candidates = len(store.candidate_ids)
+    flat, offsets = store.arrays()
+    ends = offsets[1:]
+    cursor = offsets[:-1].copy()
+    counts = _countChoices(flat[cursor], weights, num_candidates)
+    live = np.arange(len(store))  # ballots that still have a choice left
+
+    def reassign(active, stats):
+        nonlocal live
+        moved = _advanceCursors(flat, ends, cursor, live, active, stats)
+        live = live[cursor[live] < ends[live]]
+        moved_weights = None if weights is None else weights[moved]
+        moved_counts = _countChoices(flat[cursor[moved]], moved_weights, num_candidates)
+        num_votes = len(live) if weights is None else int(weights[live].sum())
+        return moved_counts, num_votes
+
+    return _tallyRounds(
+        store.candidate_ids,
+        candidate_pos,
+        counts,
+        int(counts.sum()),
+        reassign,
+        on_round,
+    )
+
+
+def aggregateBallots(
+    ballots, chunk_size: int = 1_000_000
+) -> Tuple[BallotStore, np.ndarray]:
+    """Collapse identical sanitized ballots into one (ranking, weight) entry,
+    return a BallotStore of the distinct rankings and an int64 array of how
+    many voters cast each. A BallotStore input is grouped chunk by chunk with
+    np.unique over rows padded to the chunk's deepest ballot. O(N * B)"""
+    patterns = Counter()
+    if isinstance(ballots, BallotStore):
+        flat, offsets = ballots.arrays()
+        ids = ballots.candidate_ids
+        for lo in range(0, len(ballots), chunk_size):
+            hi = min(lo + chunk_size, len(ballots))
+            starts = offsets[lo:hi]
+            lengths = offsets[lo + 1 : hi + 1] - starts
+            filled = np.arange(lengths.max()) < lengths[:, None]
+            padded = np.full(filled.shape, -1, dtype=np.int32)
+            # row-major boolean assignment lays each ballot out in its row
+            padded[filled] = flat[offsets[lo] : offsets[hi]]
+            rows, row_counts = np.unique(padded, axis=0, return_counts=True)
+            for row, count in zip(rows, row_counts):
+                patterns[tuple(ids[c] for c in row if c >= 0)] += int(count)
+    else:
+        for b in ballots:
+            if len(b) > 0:
+                patterns[tuple(dict.fromkeys(b))] += 1
+    store = BallotStore()
+    store.add_ballots(patterns.keys())
+    weights = np.fromiter(patterns.values(), dtype=np.int64, count=len(patterns))
+    return store, weights
+
+
+def rankedChoiceVotingAggregated(
+    ballots,
+    candidates: Optional[List[int]] = [1, 2, 3, 4, 5, 6],
+    on_round: Optional[Callable[[dict], None]] = None,
+) -> Optional[int]:
+    """Run the elimination on distinct rankings weighted by voter count, so
+    each round costs O(P * B) for P distinct rankings instead of O(N).
+    Round stats count distinct rankings, not voters"""
+    store, weights = aggregateBallots(ballots)
+    return rankedChoiceVotingArray(store, candidates, weights, on_round)
+
+
+def _padCounts(counts: np.ndarray, num_candidates: int) -> np.ndarray:
+    """Extend a per-candidate array with zeros for newly seen candidates"""
+    if len(counts) >= num_candidates:
+        return counts
+    padded = np.zeros(num_candidates, dtype=counts.dtype)
+    padded[: len(counts)] = counts
+    return padded
+
+
+class RankedChoiceTally:
+    """Stateful ranked-choice count for ballots that arrive in batches.
+    Sanitized ballots, their cursors and the tally at the start of every
+    elimination round are kept between calls. add_ballots only walks the new
+    ballots through the recorded rounds, O(batch * M), and current_result
+    re-checks each round's decision from the stored tallies, O(M^2). The
+    full count is redone only when the new ballots change which candidates
+    get eliminated (or bring in a new first choice candidate)"""
+
+    def __init__(self, candidates: Optional[List[int]] = [1, 2, 3, 4, 5, 6]):
+        self.candidates = list(candidates)
+        self.store = BallotStore()
+        self._candidate_pos = [self.store.candidate_position(c) for c in candidates]
+        self._first_counts = np.zeros(len(self.store.candidate_ids), dtype=np.int64)
+        # cursors live in a capacity-doubling buffer; _cursor views its
+        # filled part, so appending a batch doesn't copy the earlier ones
+        self._cursor_buffer = np.zeros(0, dtype=np.int64)
+        self._cursor = self._cursor_buffer
+        self._rounds: List[np.ndarray] = []  # tally at the start of each round
+        self._eliminated: List[np.ndarray] = []  # candidates dropped per round
+        self._result: Optional[int] = None
+        self._stale = False  # ballots added since _rounds was last checked
+
+    def add_ballots(self, batch: Iterable[List[int]]) -> int:
+        """Sanitize and add a batch of ballots, return number kept"""
+        first_ballot = len(self.store)
+        old_active = _initialActive(self._first_counts, self._candidate_pos)
+        kept = self.store.add_ballots(batch)
+        if kept == 0:
+            return 0
+        num_candidates = len(self.store.candidate_ids)
+        flat, offsets = self.store.arrays()
+        ends = offsets[1:]
+        new = np.arange(first_ballot, first_ballot + kept)
+        self._appendCursors(offsets[new])
+        first_choices = flat[self._cursor[new]]
+        self._first_counts = _padCounts(self._first_counts, num_candidates)
+        self._first_counts += np.bincount(first_choices, minlength=num_candidates)
+        self._stale = True
+        if (first_choices >= len(old_active)).any() or not old_active[
+            first_choices
+        ].all():
+            # a new first choice candidate changes the starting field, which
+            # can stop earlier ballots on a candidate they used to skip
+            self._rounds = []
+            return kept
+
+        # replay the recorded eliminations for the new ballots only
+        active = _padCounts(old_active, num_candidates)
+        live = new
+        for r in range(len(self._rounds)):
+            if r > 0:
+                active[self._eliminated[r - 1]] = False
+                _advanceCursors(flat, ends, self._cursor, live, active)
+                live = live[self._cursor[live] < ends[live]]
+            self._rounds[r] = _padCounts(self._rounds[r], num_candidates)
+            self._rounds[r] += np.bincount(
+                flat[self._cursor[live]], minlength=num_candidates
+            )
+        if len(self._eliminated) == len(self._rounds) > 0:
+            # the count ran out of rounds after a final elimination
+            active[self._eliminated[-1]] = False
+            _advanceCursors(flat, ends, self._cursor, live, active)
+        return kept
+
+    def _appendCursors(self, cursors: np.ndarray) -> None:
+        """Append cursors in amortized O(len(cursors))"""
+        n = len(self._cursor)
+        size = n + len(cursors)
+        if size > len(self._cursor_buffer):
+            buffer = np.empty(max(size, 2 * len(self._cursor_buffer)), dtype=np.int64)
+            buffer[:n] = self._cursor
+            self._cursor_buffer = buffer
+        self._cursor_buffer[n:size] = cursors
+        self._cursor = self._cursor_buffer[:size]
+
+    def current_result(self) -> Optional[int]:
+        """Return the winner over every ballot added so far, or None; same
+        result as rankedChoiceVoting on all ballots at once"""
+        if not self._stale:
+            return self._result
+        self._stale = False
+        if len(self.store) == 0:
+            self._result = None
+            return None
+        if not self._rounds:
+            self._recount()
+            return self._result
+
+        active = _initialActive(self._first_counts, self._candidate_pos)
+        for r, counts in enumerate(self._rounds):
+            winner, eliminated = _roundDecision(counts, active, counts.sum())
+            if r < len(self._eliminated):
+                if eliminated is None or not np.array_equal(
+                    eliminated, self._eliminated[r]
+                ):
+                    self._recount()
+                    return self._result
+                active[eliminated] = False
+            elif eliminated is None:
+                self._result = (
+                    None if winner is None else self.store.candidate_ids[winner]
+                )
+                return self._result
+            else:
+                # the old final round now eliminates someone; the cursors are
+                # already in that round's state, so just keep counting
+                del self._rounds[r:]
+                self._runRounds(r, counts.copy(), active)
+                return self._result
+        self._result = None
+        return None
+
+    def _recount(self) -> None:
+        """Redo every round from the first choices, reusing the stored
+        sanitized ballots"""
+        flat, offsets = self.store.arrays()
+        self._cursor_buffer = offsets[:-1].copy()
+        self._cursor = self._cursor_buffer
+        self._rounds = []
+        self._eliminated = []
+        active = _initialActive(self._first_counts, self._candidate_pos)
+        self._runRounds(0, self._first_counts.copy(), active)
+
+    def _runRounds(self, start_round: int, counts: np.ndarray, active) -> None:
+        """Count rounds from start_round on, recording each round's tally"""
+        num_candidates = len(self.store.candidate_ids)
+        flat, offsets = self.store.arrays()
+        ends = offsets[1:]
+        live = np.flatnonzero(self._cursor < ends)
+        self._result = None
+        for r in range(start_round, len(self._candidate_pos)):
+            self._rounds.append(counts.copy())
+            winner, eliminated = _roundDecision(counts, active, counts.sum())
+            if eliminated is None:
+                if winner is not None:
+                    self._result = self.store.candidate_ids[winner]
+                return
+            self._eliminated.append(eliminated)
+            active[eliminated] = False
+            counts[eliminated] = 0
+            moved = _advanceCursors(flat, ends, self._cursor, live, active)
+            live = live[self._cursor[live] < ends[live]]
+            counts += np.bincount(flat[self._cursor[moved]], minlength=num_candidates)
+
+
+# memory maps opened by this worker process, keyed by file path
+_shard_maps: dict = {}
+
+
+def _openShardMap(path: str, dtype: str, mode: str) -> np.ndarray:
+    mapped = _shard_maps.get(path)
+    if mapped is None:
+        mapped = np.memmap(path, dtype=dtype, mode=mode)
+        _shard_maps[path] = mapped
+    return mapped
+
+
+def _tallyShard(
+    paths: Tuple[str, str, str],
+    lo: int,
+    hi: int,
+    active: Optional[np.ndarray],
+    num_candidates: int,
+) -> Tuple[np.ndarray, int, dict]:
+    """Worker side of rankedChoiceVotingParallel for ballots lo..hi-1. With
+    active=None return the first choice tally of the shard, otherwise move
+    the shard's ballots off inactive candidates and return the tally of
+    their new choices. Cursors live in a shared memory-mapped file, so any
+    worker can take any shard. Also returns the shard's live ballot count
+    and its reassigned/skipped counters"""
+    flat_path, offsets_path, cursor_path = paths
+    flat = _openShardMap(flat_path, "<i4", "r")
+    offsets = _openShardMap(offsets_path, "<i8", "r")
+    cursor = _openShardMap(cursor_path, "<i8", "r+")
+    ends = offsets[1:]
+    live = np.arange(lo, hi)
+    live = live[cursor[live] < ends[live]]
+    stats = {"reassigned": 0, "skipped": 0}
+    if active is None:
+        counts = np.bincount(flat[cursor[live]], minlength=num_candidates)
+        return counts, len(live), stats
+    moved = _advanceCursors(flat, ends, cursor, live, active, stats)
+    live = live[cursor[live] < ends[live]]
+    counts = np.bincount(flat[cursor[moved]], minlength=num_candidates)
+    return counts, len(live), stats
+
+
+def rankedChoiceVotingParallel(
+    ballots,
+    candidates: Optional[List[int]] = [1, 2, 3, 4, 5, 6],
+    workers: Optional[int] = None,
+    shards: Optional[int] = None,
+    on_round: Optional[Callable[[dict], None]] = None,
+) -> Optional[int]:
+    """Sharded, multi-process version of rankedChoiceVotingArray. Ballots
+    are split into contiguous shards (default one per worker); each round
+    every shard redistributes its own ballots in a ProcessPoolExecutor
+    worker and returns partial counts that the parent sums. Counts are
+    exact integers, so the result is identical to the serial engines.
+    Ballot arrays are shared with the workers through memory-mapped files
+    (a DiskBallotStore's own files are used as is)"""
+    store = _toBallotStore(ballots)
+    if len(store) == 0:
+        return None
+    workers = workers or os.cpu_count() or 1
+    shards = max(1, min(shards or workers, len(store)))
+    candidate_pos = [store.candidate_position(c) for c in candidates]
+    num_candidates = len(store.candidate_ids)
+    with tempfile.TemporaryDirectory() as tmp:
+        if isinstance(store, DiskBallotStore):
+            flat_path, offsets_path = store._flat_path, store._offsets_path
+        else:
+            flat_path = os.path.join(tmp, "flat.i32")
+            offsets_path = os.path.join(tmp, "offsets.i64")
+            flat, offsets = store.arrays()
+            flat.astype("<i4").tofile(flat_path)
+            offsets.astype("<i8").tofile(offsets_path)
+            del flat, offsets
+        cursor_path = os.path.join(tmp, "cursor.i64")
+        offsets = np.memmap(offsets_path, dtype="<i8", mode="r")
+        np.asarray(offsets[:-1]).astype("<i8").tofile(cursor_path)
+        del offsets
+        paths = (flat_path, offsets_path, cursor_path)
+        bounds = np.linspace(0, len(store), shards + 1).astype(np.int64)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+
+            def reassign(active, stats=None):
+                futures = [
+                    pool.submit(_tallyShard, paths, lo, hi, active, num_candidates)
+                    for lo, hi in zip(bounds[:-1], bounds[1:])
+                ]
+                moved_counts = np.zeros(num_candidates, dtype=np.int64)
+                num_votes = 0
+                for future in futures:
+                    shard_counts, shard_votes, shard_stats = future.result()
+                    moved_counts += shard_counts
+                    num_votes += shard_votes
+                    if stats is not None:
+                        stats["reassigned"] += shard_stats["reassigned"]
+                        stats["skipped"] += shard_stats["skipped"]
+                return moved_counts, num_votes
+
+            counts, num_votes = reassign(None)
+            return _tallyRounds(
+                store.candidate_ids,
+                candidate_pos,
+                counts,
+                num_votes,
+                reassign,
+                on_round,
+            )
+
+
+if __name__ == "__main__":
+    test_ballots_1 = [[1], [1], [2], [2], [], [3, 4, 5], [5, 5, 4, 4, 3, 4]]
+    test_ballots_2 = [[1], [1], [2], [], [3, 4, 5]]
+    test_ballots_3 = [[]]
+    test_run_1 = rankedChoiceVoting(test_ballots_1)
+    test_run_2 = rankedChoiceVoting(test_ballots_2)
+    test_run_3 = rankedChoiceVoting(test_ballots_3)
+    print(f"test 1, expected: None, actual: {test_run_1}\n")
+    print(f"test 2, expected: 1,    actual: {test_run_2}\n")
+    print(f"test 3, expected: None, actual: {test_run_3}\n")
+    test_run_array_1 = rankedChoiceVoting(test_ballots_1, engine="array")
+    test_run_array_2 = rankedChoiceVoting(test_ballots_2, engine="array")
+    test_run_array_3 = rankedChoiceVoting(test_ballots_3, engine="array")
+    print(f"array test 1, expected: None, actual: {test_run_array_1}\n")
+    print(f"array test 2, expected: 1,    actual: {test_run_array_2}\n")
+    print(f"array test 3, expected: None, actual: {test_run_array_3}\n")
+    test_run_parallel_2 = rankedChoiceVoting(test_ballots_2, engine="parallel")
+    print(f"parallel test 2, expected: 1,    actual: {test_run_parallel_2}\n")
+    test_run_aggregate_1 = rankedChoiceVoting(test_ballots_1, engine="aggregate")
+    test_run_aggregate_2 = rankedChoiceVoting(test_ballots_2, engine="aggregate")
+    print(f"aggregate test 1, expected: None, actual: {test_run_aggregate_1}\n")
+    print(f"aggregate test 2, expected: 1,    actual: {test_run_aggregate_2}\n")
+    test_tally = RankedChoiceTally()
+    test_tally.add_ballots(test_ballots_2[:3])
+    test_tally.add_ballots(test_ballots_2[3:])
+    test_run_tally = test_tally.current_result()
+    print(f"tally test 2, expected: 1,    actual: {test_run_tally}\n")
@@ -1,5 +1,19 @@
-from typing import Optional, List
-from datetime import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional, List, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library parser
+    orjson = None
 
 
 def fizzbuzz() -> None:
@@ -26,18 +40,107 @@ def convert_to_float(input_str: str, default: float) -> float:
         return default
 
 
+class MedicationIndex:
+    """Inverted indexes over the medications of one data_obj, built once.
+    For every field whose values are strings (or lists of strings) it keeps
+    each distinct value with the sorted positions of the medications that
+    have it, and a trigram index from 3-character substrings to distinct
+    values. Exact queries are a dict lookup; partial queries only check the
+    distinct values containing all trigrams of the query. Results come back
+    in medication order, the same as list_matching_field_value_in_medications"""
+
+    def __init__(self, data_obj: dict):
+        self.medications = data_obj.get("medications") or []
+        self._postings = {}  # field -> {value: [medication positions]}
+        self._trigrams = {}  # field -> {trigram: set of values}
+        unindexable = set()
+        for pos, med in enumerate(self.medications):
+            for field, desired_field in med.items():
+                if not desired_field or field in unindexable:
+                    continue
+                traits = (
+                    desired_field
+                    if isinstance(desired_field, (list, tuple))
+                    else [desired_field]
+                )
+                if not all(isinstance(trait, str) for trait in traits):
+                    # nested records etc. keep the generic scan's semantics
+                    unindexable.add(field)
+                    continue
+                postings = self._postings.setdefault(field, {})
+                for trait in traits:
+                    positions = postings.setdefault(trait, [])
+                    if not positions or positions[-1] != pos:
+                        positions.append(pos)
+        for field in unindexable:
+            self._postings.pop(field, None)
+        self._unindexable = unindexable
+        for field, postings in self._postings.items():
+            trigrams = self._trigrams[field] = {}
+            for trait in postings:
+                for i in range(len(trait) - 2):
+                    trigrams.setdefault(trait[i : i + 3], set()).add(trait)
+
+    def positions(
+        self, field: str, value: str, partial_match: bool = False
+    ) -> List[int]:
+        """Return sorted positions of medications whose field matches value,
+        as a new list"""
+        postings = self._postings.get(field)
+        if postings is None:
+            if field not in self._unindexable:
+                return []  # no medication has a value for this field
+            return [
+                pos
+                for pos, med in enumerate(self.medications)
+                if list_matching_field_value_in_medications(
+                    {"medications": [med]}, field, value, partial_match
+                )
+            ]
+        # copies, so callers can't change the postings
+        if not partial_match:
+            return list(postings.get(value, ()))
+        if len(value) < 3:
+            matches = [trait for trait in postings if value in trait]
+        else:
+            trigrams = self._trigrams[field]
+            candidates = None
+            for i in range(len(value) - 2):
+                traits = trigrams.get(value[i : i + 3])
+                if not traits:
+                    return []
+                candidates = traits if candidates is None else candidates & traits
+            matches = [trait for trait in candidates if value in trait]
+        if len(matches) == 1:
+            return list(postings[matches[0]])
+        return sorted({pos for trait in matches for pos in postings[trait]})
+
+    def query(self, field: str, value: str, partial_match: bool = False) -> List:
+        """Same result as list_matching_field_value_in_medications"""
+        return [
+            self.medications[pos] for pos in self.positions(field, value, partial_match)
+        ]
+
+
 def list_matching_field_value_in_medications(
-    data_obj: dict, field: str, value: str, partial_match: Optional[bool] = False
+    data_obj: dict,
+    field: str,
+    value: str,
+    partial_match: Optional[bool] = False,
+    index: Optional[MedicationIndex] = None,
 ) -> List:
     """Generic function to return list of medications with a value matching
-    given field (partial or exact match; exact match by default)"""
+    given field (partial or exact match; exact match by default). If given,
+    index (a MedicationIndex of data_obj) answers without scanning"""
+    if index is not None:
+        return index.query(field, value, partial_match)
     res = []
     medications = data_obj.get("medications")
     if medications is not None:
         for med in medications:
             desired_field = med.get(field)
             if desired_field:
-                if isinstance(desired_field, list):
+                if isinstance(desired_field, (list, tuple)):
                     for trait in desired_field:
                         if partial_match and value in trait:
                             res.append(med)
@@ -53,29 +156,253 @@ def list_matching_field_value_in_medications(
     return res
 
 
-def get_antihtn_meds(data_obj: dict) -> List:
+def get_antihtn_meds(data_obj: dict, index: Optional[MedicationIndex] = None) -> List:
     """return list of all medications that have 'antihtn' in 'drugGroup' field"""
     field = "drugGroup"
     value = "antihtn"
     partial_match = False
     return list_matching_field_value_in_medications(
-        data_obj, field, value, partial_match
+        data_obj, field, value, partial_match, index
     )
 
 
-def get_tablet_meds(data_obj: dict) -> List:
+def get_tablet_meds(data_obj: dict, index: Optional[MedicationIndex] = None) -> List:
     """return list of all medications whose 'doseForm' is any type of 'tablet'"""
     field = "doseForm"
     value = "tablet"
     partial_match = True
     return list_matching_field_value_in_medications(
-        data_obj, field, value, partial_match
+        data_obj, field, value, partial_match, index
+    )
+
+
+def _epoch_day(value) -> int:
+    """Days since 1970-01-01 for a date, datetime or ISO format string"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class Fill:
+    """Compact typed fill: date as days since 1970-01-01; daysSupply and
+    quantity keep their text, with the parsed numbers in *_value"""
+
+    __slots__ = (
+        "fill_day",
+        "daysSupply",
+        "quantity",
+        "daysSupply_value",
+        "quantity_value",
+    )
+
+    def __init__(self, fill: dict):
+        fillDate = fill.get("fillDate")
+        self.fill_day = _epoch_day(fillDate) if fillDate else None
+        for key in ("daysSupply", "quantity"):
+            value = fill.get(key)
+            setattr(self, key, sys.intern(value) if isinstance(value, str) else value)
+            setattr(self, key + "_value", _parse_number(value))
+
+    def get(self, key: str, default=None):
+        """dict-style access so code written for raw fills keeps working"""
+        if key == "fillDate":
+            if self.fill_day is None:
+                return default
+            return date.fromordinal(self.fill_day + _EPOCH_ORDINAL).isoformat()
+        value = getattr(self, key) if key in ("daysSupply", "quantity") else None
+        return default if value is None else value
+
+
+class Medication:
+    """Compact typed medication. Known CMR fields are slots (repeated
+    strings interned, drugGroup a tuple, fills Fill objects); any other
+    field is kept in extra. Numeric fields keep their text, so get and
+    items mirror the raw dict and the query functions accept either form;
+    their parsed int/float values are in <field>_value (see number)"""
+
+    _FIELDS = (
+        "ndc9",
+        "brandName",
+        "genericName",
+        "display",
+        "dosageStrength",
+        "dosageUnit",
+        "doseForm",
+        "drugGroup",
+        "route",
+        "quantity",
+        "daysSupply",
+        "unitsPerDay",
+        "dosePerDay",
+        "fills",
     )
+    _NUMERIC = ("quantity", "daysSupply", "unitsPerDay", "dosePerDay")
+    __slots__ = _FIELDS + tuple(name + "_value" for name in _NUMERIC) + ("extra",)
+    _INTERNED = frozenset(("dosageUnit", "doseForm", "route") + _NUMERIC)
+
+    def __init__(self, med: dict):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        extra = {}
+        for key, value in med.items():
+            if key not in self._FIELDS:
+                extra[key] = value
+                continue
+            if key in self._NUMERIC:
+                setattr(self, key + "_value", _parse_number(value))
+            if key in self._INTERNED and isinstance(value, str):
+                setattr(self, key, sys.intern(value))
+            elif key == "drugGroup" and isinstance(value, list):
+                self.drugGroup = tuple(sys.intern(g) for g in value)
+            elif key == "fills" and isinstance(value, list):
+                self.fills = [Fill(f) for f in value]
+            else:
+                setattr(self, key, value)
+        self.extra = extra or None
+
+    def get(self, key: str, default=None):
+        if key in self._FIELDS:
+            value = getattr(self, key)
+        else:
+            value = self.extra.get(key) if self.extra else None
+        return default if value is None else value
+
+    def number(self, key: str):
+        """Parsed value of a numeric field, None if missing or not numeric"""
+        if key in self._NUMERIC:
+            return getattr(self, key + "_value")
+        return _number(self.get(key))
+
+    def items(self):
+        for name in self._FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                yield name, value
+        if self.extra:
+            yield from self.extra.items()
+
+
+class CMRRecord:
+    """Compact typed form of a CMR data_obj, see load_cmr_record"""
 
+    __slots__ = ("id", "etlUpdated", "resourceType", "medications")
 
-def get_latest_med_filled(data_obj: dict) -> Optional[dict]:
+    def __init__(self, data_obj: dict):
+        self.id = data_obj.get("id")
+        self.etlUpdated = data_obj.get("etlUpdated")
+        self.resourceType = data_obj.get("resourceType")
+        medications = data_obj.get("medications")
+        self.medications = (
+            None if medications is None else [Medication(m) for m in medications]
+        )
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+
+def load_cmr_record(data_obj: dict) -> CMRRecord:
+    """Convert a parsed CMR data_obj into __slots__ objects with numeric
+    fields and fill dates parsed once. Every field queries exactly as in
+    the raw dict; Range queries use the parsed numbers"""
+    return CMRRecord(data_obj)
+
+
+def _parse_number(value):
+    """int for whole numbers, float otherwise, None if not numeric"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    number = convert_to_float(value, None)
+    if number is not None and number.is_integer() and "." not in value:
+        return int(number)
+    return number
+
+
+def _fill_day(f) -> Optional[int]:
+    """Epoch day of a raw or typed fill, None if it has no date"""
+    if isinstance(f, Fill):
+        return f.fill_day
+    fillDate = f.get("fillDate")
+    return _epoch_day(fillDate) if fillDate else None
+
+
+def _fill_datetime(f) -> Optional[datetime]:
+    if isinstance(f, Fill):
+        if f.fill_day is None:
+            return None
+        return datetime.fromordinal(f.fill_day + _EPOCH_ORDINAL)
+    fillDate = f.get("fillDate")
+    return datetime.fromisoformat(fillDate) if fillDate else None
+
+
+class FillTimeline:
+    """Every fill of one data_obj parsed once into parallel arrays sorted by
+    fill date: epoch days, days supplied and positions of the medication each
+    fill belongs to. Date queries are binary searches over the days array.
+    A fill's daysSupply falls back to its medication's"""
+
+    def __init__(self, data_obj: dict):
+        self.medications = data_obj.get("medications") or []
+        entries = []
+        for pos, med in enumerate(self.medications):
+            med_supply = convert_to_float(med.get("daysSupply"), 0.0)
+            for f in med.get("fills") or []:
+                fill_day = _fill_day(f)
+                if fill_day is not None:
+                    supply = convert_to_float(f.get("daysSupply"), med_supply)
+                    entries.append((fill_day, pos, int(supply), f))
+        entries.sort(key=lambda e: e[0])  # stable: ties keep medication order
+        self.days = array("i", (e[0] for e in entries))
+        self.med_positions = array("i", (e[1] for e in entries))
+        self.days_supply = array("i", (e[2] for e in entries))
+        self.fills = [e[3] for e in entries]
+        self.max_days_supply = max(self.days_supply, default=0)
+
+    def latest_med(self) -> Optional[dict]:
+        """Medication with the most recent fill; on a tie the first one in
+        medication order, as get_latest_med_filled"""
+        if not self.days:
+            return None
+        first_latest = bisect_left(self.days, self.days[-1])
+        return self.medications[self.med_positions[first_latest]]
+
+    def fills_between(self, start, end) -> List[Tuple[dict, dict]]:
+        """(medication, fill) pairs filled from start to end inclusive, by date"""
+        lo = bisect_left(self.days, _epoch_day(start))
+        hi = bisect_right(self.days, _epoch_day(end))
+        return [
+            (self.medications[self.med_positions[i]], self.fills[i])
+            for i in range(lo, hi)
+        ]
+
+    def active_on(self, day) -> List[dict]:
+        """Medications with a fill covering day (fill date up to fill date +
+        daysSupply - 1), in medication order. Only fills from the last
+        max_days_supply days are examined"""
+        day = _epoch_day(day)
+        lo = bisect_right(self.days, day - self.max_days_supply)
+        hi = bisect_right(self.days, day)
+        positions = {
+            self.med_positions[i]
+            for i in range(lo, hi)
+            if self.days[i] + self.days_supply[i] > day
+        }
+        return [self.medications[pos] for pos in sorted(positions)]
+
+
+def get_latest_med_filled(
+    data_obj: dict, timeline: Optional[FillTimeline] = None
+) -> Optional[dict]:
     """return entire medication data for most recently filled;
-    if there is a tie, return one item only, no preference"""
+    if there is a tie, return one item only, no preference. If given,
+    timeline (a FillTimeline of data_obj) answers without reparsing dates"""
+    if timeline is not None:
+        return timeline.latest_med()
     medications = data_obj.get("medications")
     if not medications:
         return None
@@ -86,33 +413,303 @@ def get_latest_med_filled(data_obj: dict) -> Optional[dict]:
         fills = med.get("fills")
         if fills:
             for f in fills:
-                fillDate = f.get("fillDate")
-                if fillDate:
-                    current_med_filldate = datetime.fromisoformat(fillDate)
+                current_med_filldate = _fill_datetime(f)
+                if current_med_filldate is not None:
                     if current_med_filldate > latest_filldate:
+                        latest_filldate = current_med_filldate
                         latest_med = med
     return latest_med
 
 
-def get_latest_med_ndc(data_obj: dict) -> Optional[str]:
-    latest_med = get_latest_med_filled(data_obj)
+def get_latest_med_ndc(
+    data_obj: dict, timeline: Optional[FillTimeline] = None
+) -> Optional[str]:
+    latest_med = get_latest_med_filled(data_obj, timeline)
     if not latest_med:
         return None
     else:
         return latest_med.get("ndc9")
 
 
-print("Test fizzbuzz")
-fizzbuzz()
-print()
-print("Test convert_to_float")
-test_float_1 = convert_to_float("85.0", 0.0)
-test_float_2 = convert_to_float("8.5E25", 0.0)
-test_float_3 = convert_to_float("kevin", 0.0)
-print(f"expected: 85.0,    actual: {test_float_1}")
-print(f"expected: 8.5e+25, actual: {test_float_2}")
-print(f"expected: 0.0,     actual: {test_float_3}")
-print()
+class Predicate:
+    """Base of the composable medication query predicates; combine them
+    with & and | (or And / Or) and run them with query_medications"""
+
+    def __and__(self, other: "Predicate") -> "Predicate":
+        return And((self, other))
+
+    def __or__(self, other: "Predicate") -> "Predicate":
+        return Or((self, other))
+
+
+@dataclass(frozen=True)
+class Exact(Predicate):
+    """field equals value (any element of a list field)"""
+
+    field: str
+    value: str
+
+
+@dataclass(frozen=True)
+class Partial(Predicate):
+    """value is a substring of field (of any element of a list field)"""
+
+    field: str
+    value: str
+
+
+@dataclass(frozen=True)
+class Range(Predicate):
+    """numeric field between low and high inclusive; either bound optional"""
+
+    field: str
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class FilledBetween(Predicate):
+    """some fill dated from start to end inclusive (ISO strings or dates)"""
+
+    start: object
+    end: object
+
+
+@dataclass(frozen=True)
+class And(Predicate):
+    parts: Tuple[Predicate, ...]
+
+
+@dataclass(frozen=True)
+class Or(Predicate):
+    parts: Tuple[Predicate, ...]
+
+
+def _traits(med, field: str) -> tuple:
+    desired_field = med.get(field)
+    if not desired_field:
+        return ()
+    if isinstance(desired_field, (list, tuple)):
+        return desired_field
+    return (desired_field,)
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return value
+    return convert_to_float(value, None) if isinstance(value, str) else None
+
+
+class CompiledQuery:
+    """A predicate compiled once into a matcher for a single pass over the
+    medications, plus a plan that answers the indexable parts (Exact and
+    Partial through a MedicationIndex, FilledBetween through a FillTimeline)
+    as position sets. Get instances from compile_query, which caches them"""
+
+    def __init__(self, predicate: Predicate):
+        self.predicate = predicate
+        self._matchers = {}
+        self.match = self._compile(predicate)
+
+    def _compile(self, p: Predicate):
+        match = self._matchers.get(p)
+        if match is None:
+            match = self._matchers[p] = self._build(p)
+        return match
+
+    def _build(self, p: Predicate):
+        if isinstance(p, Exact):
+            field, value = p.field, p.value
+            return lambda med: value in _traits(med, field)
+        if isinstance(p, Partial):
+            field, value = p.field, p.value
+            return lambda med: any(value in t for t in _traits(med, field))
+        if isinstance(p, Range):
+            field = p.field
+            low = float("-inf") if p.low is None else p.low
+            high = float("inf") if p.high is None else p.high
+
+            def match_range(med) -> bool:
+                if isinstance(med, Medication):
+                    number = med.number(field)
+                else:
+                    number = _number(med.get(field))
+                return number is not None and low <= number <= high
+
+            return match_range
+        if isinstance(p, FilledBetween):
+            start, end = _epoch_day(p.start), _epoch_day(p.end)
+
+            def match_fills(med) -> bool:
+                for f in med.get("fills") or ():
+                    fill_day = _fill_day(f)
+                    if fill_day is not None and start <= fill_day <= end:
+                        return True
+                return False
+
+            return match_fills
+        if isinstance(p, (And, Or)):
+            parts = [self._compile(part) for part in p.parts]
+            if isinstance(p, And):
+                return lambda med: all(match(med) for match in parts)
+            return lambda med: any(match(med) for match in parts)
+        raise TypeError(f"not a medication predicate: {p!r}")
+
+    def _positions(self, p: Predicate, index, timeline) -> Optional[set]:
+        """Positions matching p from the indexes, None if p needs a scan"""
+        if isinstance(p, (Exact, Partial)) and index is not None:
+            return set(index.positions(p.field, p.value, isinstance(p, Partial)))
+        if isinstance(p, FilledBetween) and timeline is not None:
+            lo = bisect_left(timeline.days, _epoch_day(p.start))
+            hi = bisect_right(timeline.days, _epoch_day(p.end))
+            return set(timeline.med_positions[lo:hi])
+        if isinstance(p, Or):
+            found = [self._positions(part, index, timeline) for part in p.parts]
+            if any(f is None for f in found):
+                return None
+            return set().union(*found)
+        if isinstance(p, And):
+            found = [self._positions(part, index, timeline) for part in p.parts]
+            known = [f for f in found if f is not None]
+            if not known:
+                return None
+            candidates = set.intersection(*known)
+            rest = [self._compile(part) for part, f in zip(p.parts, found) if f is None]
+            if rest:
+                meds = (index or timeline).medications
+                candidates = {
+                    pos for pos in candidates if all(match(meds[pos]) for match in rest)
+                }
+            return candidates
+        return None
+
+    def run(
+        self,
+        data_obj,
+        index: Optional[MedicationIndex] = None,
+        timeline: Optional["FillTimeline"] = None,
+    ) -> List:
+        """Matching medications in medication order"""
+        if index is not None or timeline is not None:
+            positions = self._positions(self.predicate, index, timeline)
+            if positions is not None:
+                meds = (index or timeline).medications
+                return [meds[pos] for pos in sorted(positions)]
+        medications = data_obj.get("medications") or []
+        return [med for med in medications if self.match(med)]
+
+
+@lru_cache(maxsize=256)
+def compile_query(predicate: Predicate) -> CompiledQuery:
+    return CompiledQuery(predicate)
+
+
+def query_medications(
+    data_obj,
+    predicate: Predicate,
+    index: Optional[MedicationIndex] = None,
+    timeline: Optional["FillTimeline"] = None,
+) -> List:
+    """Medications of data_obj matching predicate, e.g.
+    Exact("drugGroup", "antihtn") & Partial("doseForm", "tablet"),
+    in one pass, or from index/timeline lookups where they are given"""
+    return compile_query(predicate).run(data_obj, index, timeline)
+
+
+def _loads(line: bytes):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj) + b"\n"
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def summarize_cmr_record(data_obj: dict) -> dict:
+    """Per-patient batch result: ndc9s of antihtn and tablet medications
+    and the ndc9 of the most recently filled medication"""
+    return {
+        "id": data_obj.get("id"),
+        "antihtn": [med.get("ndc9") for med in get_antihtn_meds(data_obj)],
+        "tablet": [med.get("ndc9") for med in get_tablet_meds(data_obj)],
+        "latest_ndc9": get_latest_med_ndc(data_obj),
+    }
+
+
+def _summarize_lines(lines: List[bytes]) -> Tuple[List[bytes], int]:
+    """Worker side of process_cmr_files: parse, summarize and serialize one
+    chunk of NDJSON lines; a line that fails becomes an error record.
+    Returns the output lines and the number of errors"""
+    out = []
+    errors = 0
+    for line in lines:
+        try:
+            out.append(_dumps(summarize_cmr_record(_loads(line))))
+        except (ValueError, AttributeError, TypeError) as e:
+            out.append(_dumps({"error": f"{type(e).__name__}: {e}"}))
+            errors += 1
+    return out, errors
+
+
+def iter_line_chunks(paths: Iterable[str], chunk_size: int) -> Iterator[List[bytes]]:
+    """Yield lists of at most chunk_size non-blank raw lines from NDJSON files"""
+    chunk = []
+    for path in paths:
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    chunk.append(line)
+                    if len(chunk) == chunk_size:
+                        yield chunk
+                        chunk = []
+    if chunk:
+        yield chunk
+
+
+def process_cmr_files(
+    paths: Iterable[str],
+    output_path: str,
+    chunk_size: int = 1000,
+    workers: Optional[int] = None,
+) -> dict:
+    """Stream CMR records from newline-delimited JSON files, summarize each
+    with summarize_cmr_record in a process pool (chunk_size raw lines per
+    task, parsed in the workers with orjson when installed) and write one
+    JSON line per record to output_path, in input order. At most two chunks
+    per worker are in flight, so memory stays bounded. workers=1 runs in
+    process. Returns throughput stats"""
+    workers = workers or os.cpu_count() or 1
+    stats = {"records": 0, "errors": 0, "chunks": 0, "workers": workers}
+    start = time.perf_counter()
+
+    def write(out, summarized):
+        results, errors = summarized
+        stats["chunks"] += 1
+        stats["records"] += len(results)
+        stats["errors"] += errors
+        out.writelines(results)
+
+    with open(output_path, "wb") as out:
+        chunks = iter_line_chunks(paths, chunk_size)
+        if workers == 1:
+            for chunk in chunks:
+                write(out, _summarize_lines(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                for chunk in chunks:
+                    pending.append(pool.submit(_summarize_lines, chunk))
+                    if len(pending) >= 2 * workers:
+                        write(out, pending.pop(0).result())
+                for future in pending:
+                    write(out, future.result())
+    stats["seconds"] = time.perf_counter() - start
+    stats["records_per_second"] = (
+        stats["records"] / stats["seconds"] if stats["seconds"] else 0.0
+    )
+    return stats
+
 
 sample_data_obj = {
     "etlUpdated": "2012-12-21T23:58:00",
@@ -209,26 +806,77 @@ sample_data_obj = {
     ],
     "resourceType": "cmr",
 }
-print("Test get_antihtn_meds:")
-test_antihtn_1 = get_antihtn_meds(sample_data_obj)
-print("3 expected ndc9s: 39017-0147, 68382-0136, 00378-0018")
-print(f"{len(test_antihtn_1)} antihtn medications returned:")
-for i, t in enumerate(test_antihtn_1):
-    ndc9 = t.get("ndc9")
-    print(f"antihtn med ndc9 {i+1}: {ndc9}")
-print()
-
-print("Test get_tablet_meds:")
-test_tablet_1 = get_tablet_meds(sample_data_obj)
-print("4 expected ndc9s: 39017-0147, 60505-2671, 68382-0136, 00378-0018")
-print(f"{len(test_tablet_1)} tablet medications returned:")
-for i, t in enumerate(test_tablet_1):
-    ndc9 = t.get("ndc9")
-    print(f"tablet med ndc9 {i+1}: {ndc9}")
-print()
-
-print("Test get_latest_med_ndc:")
-print("expected latest ndc9: 00378-0018")
-test_ndc_1 = get_latest_med_ndc(sample_data_obj)
-print(f"actual ndc9: {test_ndc_1}")
-print()
+
+
+if __name__ == "__main__":
+    print("Test fizzbuzz")
+    fizzbuzz()
+    print()
+    print("Test convert_to_float")
+    test_float_1 = convert_to_float("85.0", 0.0)
+    test_float_2 = convert_to_float("8.5E25", 0.0)
+    test_float_3 = convert_to_float("kevin", 0.0)
+    print(f"expected: 85.0,    actual: {test_float_1}")
+    print(f"expected: 8.5e+25, actual: {test_float_2}")
+    print(f"expected: 0.0,     actual: {test_float_3}")
+    print()
+
+    print("Test get_antihtn_meds:")
+    test_antihtn_1 = get_antihtn_meds(sample_data_obj)
+    print("3 expected ndc9s: 39017-0147, 68382-0136, 00378-0018")
+    print(f"{len(test_antihtn_1)} antihtn medications returned:")
+    for i, t in enumerate(test_antihtn_1):
+        ndc9 = t.get("ndc9")
+        print(f"antihtn med ndc9 {i+1}: {ndc9}")
+    print()
+
+    print("Test get_tablet_meds:")
+    test_tablet_1 = get_tablet_meds(sample_data_obj)
+    print("4 expected ndc9s: 39017-0147, 60505-2671, 68382-0136, 00378-0018")
+    print(f"{len(test_tablet_1)} tablet medications returned:")
+    for i, t in enumerate(test_tablet_1):
+        ndc9 = t.get("ndc9")
+        print(f"tablet med ndc9 {i+1}: {ndc9}")
+    print()
+
+    print("Test MedicationIndex:")
+    test_index = MedicationIndex(sample_data_obj)
+    test_antihtn_2 = get_antihtn_meds(sample_data_obj, test_index)
+    test_tablet_2 = get_tablet_meds(sample_data_obj, test_index)
+    print(f"expected: {len(test_antihtn_1)} antihtn, actual: {len(test_antihtn_2)}")
+    print(f"expected: {len(test_tablet_1)} tablet,  actual: {len(test_tablet_2)}")
+    print()
+
+    print("Test FillTimeline:")
+    test_timeline = FillTimeline(sample_data_obj)
+    test_ndc_2 = get_latest_med_ndc(sample_data_obj, test_timeline)
+    test_active = test_timeline.active_on("2013-01-10")
+    print(f"expected latest ndc9: 00378-0018, actual: {test_ndc_2}")
+    print("expected active on 2013-01-10: 39017-0147, 68382-0136, 00378-0018")
+    print(f"actual: {', '.join(med.get('ndc9') for med in test_active)}")
+    print()
+
+    print("Test load_cmr_record:")
+    test_record = load_cmr_record(sample_data_obj)
+    test_antihtn_3 = get_antihtn_meds(test_record)
+    test_tablet_3 = get_tablet_meds(test_record)
+    test_ndc_3 = get_latest_med_ndc(test_record)
+    print(f"expected: {len(test_antihtn_1)} antihtn, actual: {len(test_antihtn_3)}")
+    print(f"expected: {len(test_tablet_1)} tablet,  actual: {len(test_tablet_3)}")
+    print(f"expected latest ndc9: 00378-0018, actual: {test_ndc_3}")
+    print()
+
+    print("Test query_medications:")
+    test_query = Exact("drugGroup", "antihtn") & Partial("doseForm", "film coated")
+    test_query_1 = query_medications(sample_data_obj, test_query)
+    test_query_2 = query_medications(sample_data_obj, test_query, test_index)
+    print("expected ndc9s: 68382-0136, 00378-0018")
+    print(f"actual: {', '.join(med.get('ndc9') for med in test_query_1)}")
+    print(f"indexed: {', '.join(med.get('ndc9') for med in test_query_2)}")
+    print()
+
+    print("Test get_latest_med_ndc:")
+    print("expected latest ndc9: 00378-0018")
+    test_ndc_1 = get_latest_med_ndc(sample_data_obj)
+    print(f"actual ndc9: {test_ndc_1}")
+    print()
@@ -1,25 +1,156 @@
 #let's try to avoid importing other libraries
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 VECTOR_LENGTH = 2
 #our data
 paragraph = """apple banana orange apple orange banana banana apple orange apple apple orange orange math science history english history english math math math science history english history cat dog rabbit rabbit dog dog cat dog cat rabbit cat cat cat"""
 
-#randomize our word_to_vec dictionary
-word_to_vec = dict()
-for word in paragraph.split():
-    if word not in word_to_vec:
-        word_to_vec[word] = [2 * (np.random.random(1)-.5)[0] for _ in range(VECTOR_LENGTH)]
-    
-print('randomized initial values:')
-for word, vec in word_to_vec.items():
-    print(f'{word} = {vec}')
-print()
-    
 # ======================================================================================
      
     
+class SimilarityIndex:
+    # nearest neighbour index built once from word_to_vec: vectors live in
+    # one (V, d) float32 matrix (row-normalized for cosine) and queries are
+    # answered in batches with a matrix product plus argpartition top-k.
+    # lsh_tables > 0 adds a random-projection LSH index: each table hashes
+    # vectors by the signs of lsh_bits random projections, a query is
+    # compared exactly only against words sharing a bucket in some table,
+    # and falls back to the exact scan if that finds fewer than k words
+    def __init__(self, word_to_vec, metric='euclidean', lsh_tables=0, lsh_bits=12, seed=None):
+        if metric not in ('euclidean', 'cosine'):
+            raise ValueError(f'unknown metric: {metric}')
+        self.metric = metric
+        self.words = list(word_to_vec.keys())
+        self.word_ids = {word: i for i, word in enumerate(self.words)}
+        if isinstance(word_to_vec, KeyedVectors):
+            vectors = np.asarray(word_to_vec.vectors, dtype=np.float32)
+        else:
+            vectors = np.array([word_to_vec[w] for w in self.words], dtype=np.float32).reshape(len(self.words), -1)
+        if metric == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        self.vectors = vectors
+        self.sq_norms = np.einsum('ij,ij->i', vectors, vectors)
+        self.lsh_planes = []
+        self.lsh_buckets = []
+        rng = np.random.default_rng(seed)
+        for _ in range(lsh_tables):
+            planes = rng.standard_normal((vectors.shape[1], lsh_bits)).astype(np.float32)
+            keys = self._hash(vectors, planes)
+            order = np.argsort(keys, kind='stable')
+            bucket_keys, starts = np.unique(keys[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            self.lsh_planes.append(planes)
+            self.lsh_buckets.append({key: order[lo:hi] for key, lo, hi in zip(bucket_keys.tolist(), starts, ends)})
+
+    @staticmethod
+    def _hash(vectors, planes):
+        # pack the sign bit of every projection into one integer per vector
+        bits = (vectors @ planes) > 0
+        return bits.astype(np.int64) @ (1 << np.arange(planes.shape[1], dtype=np.int64))
+
+    def _distances(self, queries, candidates=None):
+        # (n, V) or (n, len(candidates)) matrix where smaller is closer:
+        # squared euclidean distance, or negative cosine similarity; built in
+        # place on the matrix product, without (n, V) temporaries
+        vectors = self.vectors if candidates is None else self.vectors[candidates]
+        dist = queries @ vectors.T
+        if self.metric == 'cosine':
+            return np.negative(dist, out=dist)
+        sq_norms = self.sq_norms if candidates is None else self.sq_norms[candidates]
+        dist *= -2
+        dist += np.einsum('ij,ij->i', queries, queries)[:,None]
+        dist += sq_norms
+        return dist
+
+    def _finish(self, dist):
+        # convert internal scores to what callers expect
+        return -dist if self.metric == 'cosine' else np.sqrt(np.maximum(dist, 0))
+
+    @staticmethod
+    def _top_k(dist, k):
+        # (ids, dist) of the k smallest entries of each row, closest first and
+        # lower ids first on ties. Only rows' k-th smallest values and a bool
+        # mask are full width; the ids come from the few entries under it
+        if k == 1:
+            ids = np.argmin(dist, axis=1)[:,None]
+            return ids, np.take_along_axis(dist, ids, axis=1)
+        kth = np.partition(dist, k-1, axis=1)[:,k-1]
+        rows, cols = np.nonzero(dist <= kth[:,None])
+        values = dist[rows, cols]
+        order = np.lexsort((cols, values, rows))
+        rows, cols, values = rows[order], cols[order], values[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        keep = rank < k
+        return cols[keep].reshape(-1, k), values[keep].reshape(-1, k)
+
+    def query_vectors(self, queries, k=1, exclude=None, batch_size=None):
+        # exact top-k for each row of queries; exclude optionally gives one
+        # word id per query to leave out (the query word itself). Returns
+        # (ids, scores) arrays of shape (n, k), closest first; scores are
+        # euclidean distances or cosine similarities. Queries go in batches of
+        # batch_size, by default sized so a (batch, V) block is about 32 MB
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms == 0, 1, norms)
+        k = min(k, len(self.words) - (exclude is not None))
+        if k <= 0:
+            return np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0), dtype=np.float32)
+        batch_size = batch_size or max(1, (1 << 23) // len(self.words))
+        all_ids = np.empty((len(queries), k), dtype=np.int64)
+        all_dist = np.empty((len(queries), k), dtype=np.float32)
+        for lo in range(0, len(queries), batch_size):
+            dist = self._distances(queries[lo:lo+batch_size])
+            if exclude is not None:
+                dist[np.arange(len(dist)), exclude[lo:lo+batch_size]] = np.inf
+            all_ids[lo:lo+batch_size], all_dist[lo:lo+batch_size] = self._top_k(dist, k)
+        return all_ids, self._finish(all_dist)
+
+    def _query_lsh(self, query, k, exclude):
+        candidates = set()
+        for planes, buckets in zip(self.lsh_planes, self.lsh_buckets):
+            bucket = buckets.get(int(self._hash(query[None,:], planes)[0]))
+            if bucket is not None:
+                candidates.update(bucket.tolist())
+        candidates.discard(exclude)
+        if len(candidates) < k:
+            return None
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        dist = self._distances(query[None,:], candidates)[0]
+        top = np.argsort(dist)[:k]
+        return candidates[top], self._finish(dist[top])
+
+    def most_similar(self, word, k=1, approximate=False):
+        # list of (word, score) for the k words closest to word
+        word_id = self.word_ids[word]
+        result = None
+        if approximate and self.lsh_planes:
+            result = self._query_lsh(self.vectors[word_id], k, word_id)
+        if result is None:
+            ids, scores = self.query_vectors(self.vectors[word_id], k, exclude=np.array([word_id]))
+            result = ids[0], scores[0]
+        return [(self.words[i], float(score)) for i, score in zip(*result)]
+
+    def all_most_similar(self, k=1, batch_size=None):
+        # top-k neighbours of every word at once, as {word: [(word, score)]}
+        ids, scores = self.query_vectors(self.vectors, k, exclude=np.arange(len(self.words)), batch_size=batch_size)
+        return {word: [(self.words[i], float(score)) for i, score in zip(row_ids, row_scores)]
+                for word, row_ids, row_scores in zip(self.words, ids, scores)}
+
 # (1) implement the get_most_similar_word function
-def get_most_similar_word(word, word_to_vec):
+def get_most_similar_word(word, word_to_vec, index=None):
+    # index (a SimilarityIndex over word_to_vec) answers without the scan
+    if index is not None:
+        similar = index.most_similar(word)
+        return similar[0][0] if similar else None
     min_dist = float('inf')
     closest_word = word
     word_embedding = word_to_vec[word]
@@ -44,8 +175,8 @@ def get_most_similar_word(word, word_to_vec):
 #this function prints out most similar word for each word
 def print_most_similar_words(word_to_vec):
     print('most similar after training:')
-    for w in word_to_vec:
-        print(f'{w} ~ {get_most_similar_word(w, word_to_vec)}')
+    for w, similar in SimilarityIndex(word_to_vec).all_most_similar().items():
+        print(f'{w} ~ {similar[0][0] if similar else None}')
         print()
 
 #print_most_similar_words(word_to_vec)
@@ -59,80 +190,436 @@ def print_most_similar_words(word_to_vec):
 def calc_avg_vector(vec1:list,vec2:list,learning_rate:float,mult:float) -> list:
     return [(w1+w2)*learning_rate*mult/len(vec1) for w1,w2 in zip(vec1,vec2)]
 
-def update_word_vectors(word_to_vec, paragraph,learning_rate=0.001,iterations=10000,vector_length=VECTOR_LENGTH,penalty_rate=2.,debug = True):
-    # loop through paragraph, any word that is next to another is similar
-    # any word that is not next to the other is different
-    seen_tuples = {} # key is tuple, value is count seen
-    words = paragraph.split()
-    # loop through paragraph, counting occurrence of each bigram
+def count_bigrams(words:list, word_ids:dict) -> dict:
+    # count each unordered pair of different adjacent words, keyed by id tuple
+    # in the order the pair was first seen
+    seen_tuples = {}
     for i in range(len(words)-1):
-        word1 = words[i]
-        word2 = words[i+1]
-        if word1 == word2:
+        id1 = word_ids[words[i]]
+        id2 = word_ids[words[i+1]]
+        if id1 == id2:
             continue
-        if (word1,word2) not in seen_tuples and (word2,word1) not in seen_tuples:
-            seen_tuples[(word1,word2)] = 1
+        if (id2,id1) in seen_tuples:
+            seen_tuples[(id2,id1)] += 1
         else:
-            if (word1,word2) not in seen_tuples:
-                seen_tuples[(word2,word1)] += 1
-            else:
-                seen_tuples[(word1,word2)] += 1
-    print(seen_tuples.values())
-    # add all unseen tuples to be able to move them farther apart
-    unseen_tuples = {}
-    for w1 in word_to_vec.keys():
-        for w2 in word_to_vec.keys():
-            if w1 != w2:
-                if (w1,w2) not in seen_tuples and (w2,w1) not in seen_tuples:
-                    unseen_tuples[(w1,w2)] = 1
-    
-    value_to_add = {}
-    for i in range(iterations):
-        value_to_add.clear()
-        for word in word_to_vec.keys():
-            value_to_add[word] = [0. for _ in range(vector_length)]
-        # Positive training loop, add average vector
-        for seen_vec,count in seen_tuples.items():
-            word1 = seen_vec[0]
-            word2 = seen_vec[1]
-            word1_vec = word_to_vec[word1]
-            word2_vec = word_to_vec[word2]
-            
-            avg_vec = calc_avg_vector(word1_vec,word2_vec,learning_rate,count)
-            #print(f"len avg_vec: {len(avg_vec)}")
-            value_to_add[word1] = [w1 + w2 for w1,w2 in zip(word1_vec,avg_vec)]
-            value_to_add[word2] = [w1 + w2 for w1,w2 in zip(word2_vec,avg_vec)]
-            #print(f"len value_to_add w1: {len(value_to_add[word1])}")
-            #print(value_to_add[word2])
-        for tup in unseen_tuples.keys():
-            word1 = tup[0]
-            word2 = tup[1]
-            word1_vec = word_to_vec[word1]
-            word2_vec = word_to_vec[word2]
-            avg_vec = calc_avg_vector(word1_vec,word2_vec,learning_rate,penalty_rate)
-            value_to_add[word1] = [w1 - w2 for w1,w2 in zip(word1_vec,avg_vec)]
-            value_to_add[word2] = [w1 - w2 for w1,w2 in zip(word2_vec,avg_vec)]
-        
-        # update step, add changed values
-        for word in word_to_vec.keys():
-            cur_word_vec = word_to_vec[word]
-            cur_word_vec = [c+v for c,v in zip(cur_word_vec,value_to_add[word])]
-            #print(f"len cur_word_vec: {len(cur_word_vec)}")
-            if (i-1) % 100 == 0: # normalize the vector so they don't grow too fast
-                l2 = np.sqrt(sum([w**2 for w in cur_word_vec]))
-                cur_word_vec = [c / l2 for c in cur_word_vec]
-            word_to_vec[word] = cur_word_vec
-        if i % 100 == 0 and debug:
-            print(f'values at epoch {i} of training:')
-            for word, vec in word_to_vec.items():
-                print(f'{word} = {vec}')
-    
+            seen_tuples[(id1,id2)] = seen_tuples.get((id1,id2),0) + 1
+    return seen_tuples
+
+def build_seen_pairs(seen_tuples:dict):
+    # returns (first ids, second ids, counts) of the seen bigrams
+    seen_a = np.array([t[0] for t in seen_tuples], dtype=np.int64)
+    seen_b = np.array([t[1] for t in seen_tuples], dtype=np.int64)
+    seen_w = np.array(list(seen_tuples.values()), dtype=np.float32)
+    return seen_a, seen_b, seen_w
+
+def build_training_pairs(seen_tuples:dict, vocab_size:int, penalty_rate:float):
+    # returns (first ids, second ids, weights) for every pair trained on:
+    # seen bigrams attract with weight = count, every other ordered pair of
+    # different words repels with weight = -penalty_rate. O(V^2)
+    seen_a, seen_b, seen_w = build_seen_pairs(seen_tuples)
+    unseen = ~np.eye(vocab_size, dtype=bool)
+    unseen[seen_a,seen_b] = False
+    unseen[seen_b,seen_a] = False
+    unseen_a, unseen_b = np.nonzero(unseen)
+    unseen_w = np.full(len(unseen_a), -penalty_rate, dtype=np.float32)
+    return (np.concatenate([seen_a,unseen_a]),
+            np.concatenate([seen_b,unseen_b]),
+            np.concatenate([seen_w,unseen_w]))
+
+def scatter_add(index:np.ndarray, values:np.ndarray, num_rows:int) -> np.ndarray:
+    # sum rows of values into out[index], one bincount per vector dimension
+    out = np.empty((num_rows, values.shape[1]), dtype=values.dtype)
+    for k in range(values.shape[1]):
+        out[:,k] = np.bincount(index, weights=values[:,k], minlength=num_rows)
+    return out
+
+def make_negative_sampler(word_counts:np.ndarray, pair_a:np.ndarray, pair_b:np.ndarray, negative_samples:int,
+                          penalty_rate:float, power=0.75, rng=None):
+    # returns a function drawing, for both words of every positive pair,
+    # negative_samples words from the unigram distribution raised to power
+    # (0.75 as in word2vec flattens it toward rare words). Each call yields
+    # (word ids, sampled ids, weights) with weight -penalty_rate, or 0 when
+    # the sample is the word itself
+    rng = np.random.default_rng(rng)
+    probs = word_counts.astype(np.float64) ** power
+    cdf = np.cumsum(probs / probs.sum())
+    centers = np.repeat(np.concatenate([pair_a,pair_b]), negative_samples)
+
+    def sample():
+        negatives = np.searchsorted(cdf, rng.random(len(centers)), side='right')
+        negatives = np.minimum(negatives, len(cdf)-1)
+        weights = np.where(negatives == centers, 0., -penalty_rate).astype(np.float32)
+        return centers, negatives, weights
+    return sample
+
+def train_embeddings(embeddings:np.ndarray, pair_a:np.ndarray, pair_b:np.ndarray, pair_w:np.ndarray,
+                     learning_rate=0.001, iterations=10000, start_iteration=0, on_epoch=None,
+                     negative_sampler=None, normalize_rows=slice(None), sparse_updates=False) -> np.ndarray:
+    # embeddings is a (V, d) float32 matrix updated in place; each iteration
+    # every pair (a, b) with weight w moves both a and b by the same
+    # w * learning_rate * average vector, all pairs at once. negative_sampler
+    # (see make_negative_sampler) adds freshly drawn repelling pairs to
+    # every iteration. normalize_rows limits renormalization to a block of
+    # rows (each parallel worker owns one block). With sparse_updates only
+    # the rows the iteration's pairs touch are written, instead of adding a
+    # dense (V, d) update to every row; the result is the same
+    vocab_size, vector_length = embeddings.shape
+    step = learning_rate / vector_length
+    touched = None
+    if sparse_updates and negative_sampler is None:
+        # the same pairs every iteration, so the same rows
+        touched = np.unique(np.concatenate([pair_a,pair_b]), return_inverse=True)
+    for i in range(start_iteration, start_iteration+iterations):
+        a, b, w = pair_a, pair_b, pair_w
+        if negative_sampler is not None:
+            neg_a, neg_b, neg_w = negative_sampler()
+            a, b, w = np.concatenate([a,neg_a]), np.concatenate([b,neg_b]), np.concatenate([w,neg_w])
+        avg_vecs = (embeddings[a] + embeddings[b]) * (w * step).astype(np.float32)[:,None]
+        if sparse_updates:
+            rows, inverse = touched or np.unique(np.concatenate([a,b]), return_inverse=True)
+            embeddings[rows] += scatter_add(inverse, np.concatenate([avg_vecs,avg_vecs]), len(rows))
+        else:
+            embeddings += scatter_add(np.concatenate([a,b]), np.concatenate([avg_vecs,avg_vecs]), vocab_size)
+        if (i-1) % 100 == 0: # normalize the vectors so they don't grow too fast
+            rows = embeddings[normalize_rows]
+            embeddings[normalize_rows] = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+        if on_epoch is not None and i % 100 == 0:
+            on_epoch(i, embeddings)
+    return embeddings
+
+def iter_token_chunks(source, chunk_size=1 << 20):
+    # yields lists of whitespace separated tokens from a file path (read
+    # chunk_size characters at a time, tokens split across reads are joined
+    # back up) or from any iterable of text pieces such as lines, grouping
+    # about chunk_size characters of text per list
+    if isinstance(source, (str, os.PathLike)):
+        with open(source) as f:
+            partial = ''
+            while True:
+                text = f.read(chunk_size)
+                if not text:
+                    break
+                tokens = (partial + text).split()
+                # the last token may continue in the next read
+                partial = tokens.pop() if tokens and not text[-1].isspace() else ''
+                if tokens:
+                    yield tokens
+            if partial:
+                yield [partial]
+    else:
+        tokens = []
+        size = 0
+        for text in source:
+            tokens.extend(text.split())
+            size += len(text)
+            if size >= chunk_size:
+                yield tokens
+                tokens = []
+                size = 0
+        if tokens:
+            yield tokens
+
+def build_vocab(source, min_count=1, chunk_size=1 << 20):
+    # first pass over the corpus: returns (vocab, counts) with every word
+    # seen at least min_count times, most frequent first (ties keep first
+    # seen order). Memory is O(distinct words), not O(corpus)
+    counter = Counter()
+    for tokens in iter_token_chunks(source, chunk_size):
+        counter.update(tokens)
+    kept = [(word, count) for word, count in counter.items() if count >= min_count]
+    kept.sort(key=lambda item: -item[1])
+    vocab = [word for word, _ in kept]
+    counts = np.array([count for _, count in kept], dtype=np.int64)
+    return vocab, counts
+
+def merge_pair_counts(keys:np.ndarray, counts:np.ndarray, new_keys:np.ndarray, new_counts:np.ndarray):
+    # merge two sparse (sorted unique pair key, count) tables in O(n + m):
+    # keys already present get their counts added, the rest are inserted at
+    # their searchsorted positions, so nothing is sorted again
+    pos = np.searchsorted(keys, new_keys)
+    found = pos < len(keys)
+    found[found] = keys[pos[found]] == new_keys[found]
+    counts = counts.copy()
+    counts[pos[found]] += new_counts[found]
+    missing = ~found
+    return np.insert(keys, pos[missing], new_keys[missing]), np.insert(counts, pos[missing], new_counts[missing])
+
+def sum_pair_counts(tables):
+    # one sorted unique (key, count) table from a list of (key, count) tables
+    keys, inverse = np.unique(np.concatenate([k for k, _ in tables]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([c for _, c in tables]), minlength=len(keys))
+    return keys, counts.astype(np.int64)
+
+def count_cooccurrences(source, word_ids:dict, window=1, chunk_size=1 << 20, buffer_pairs=1 << 20):
+    # second pass over the corpus: counts how often each unordered pair of
+    # different vocabulary words appears within window positions of each
+    # other. Words outside the vocabulary are dropped first, as word2vec
+    # does. Pairs are stored sparsely as sorted int64 keys a * V + b (a < b)
+    # with counts; chunk tables are buffered and folded into the running
+    # table once they hold as many entries as it does (at least
+    # buffer_pairs), so each entry is merged O(log) times instead of once per
+    # chunk. Returns (first ids, second ids, counts)
+    vocab_size = len(word_ids)
+    keys = np.zeros(0, dtype=np.int64)
+    counts = np.zeros(0, dtype=np.int64)
+    buffered = []
+    buffered_size = 0
+    tail = np.zeros(0, dtype=np.int64)  # last window ids of the previous chunk
+    for tokens in iter_token_chunks(source, chunk_size):
+        ids = np.fromiter((word_ids.get(t, -1) for t in tokens), dtype=np.int64, count=len(tokens))
+        ids = np.concatenate([tail, ids[ids >= 0]])
+        chunk_keys = []
+        for k in range(1, window+1):
+            # pairs starting inside the carried tail were counted last chunk
+            first = ids[max(len(tail)-k, 0):-k]
+            second = ids[max(len(tail)-k, 0)+k:]
+            different = first != second
+            low = np.minimum(first[different], second[different])
+            high = np.maximum(first[different], second[different])
+            chunk_keys.append(low * vocab_size + high)
+        buffered.append(np.unique(np.concatenate(chunk_keys), return_counts=True))
+        buffered_size += len(buffered[-1][0])
+        if buffered_size >= max(len(keys), buffer_pairs):
+            keys, counts = merge_pair_counts(keys, counts, *sum_pair_counts(buffered))
+            buffered = []
+            buffered_size = 0
+        tail = ids[-window:]
+    if buffered:
+        keys, counts = merge_pair_counts(keys, counts, *sum_pair_counts(buffered))
+    return keys // vocab_size, keys % vocab_size, counts
+
+def prepare_corpus(source, min_count=1, window=1, chunk_size=1 << 20):
+    # streams the corpus twice (vocabulary, then co-occurrences) without
+    # holding its text; source must be re-readable, e.g. a file path
+    if not isinstance(source, (str, os.PathLike)) and iter(source) is source:
+        raise ValueError('the corpus is read twice: pass a file path or a re-iterable source, not an iterator')
+    vocab, word_counts = build_vocab(source, min_count, chunk_size)
+    word_ids = {word: i for i, word in enumerate(vocab)}
+    pair_a, pair_b, pair_counts = count_cooccurrences(source, word_ids, window, chunk_size)
+    return vocab, word_counts, pair_a, pair_b, pair_counts
+
+def train_corpus(source, vector_length=VECTOR_LENGTH, min_count=1, window=1, negative_samples=5,
+                 learning_rate=0.001, iterations=1000, penalty_rate=2., sampling_power=0.75, seed=None,
+                 chunk_size=1 << 20, workers=1, checkpoint_dir=None, checkpoint_every=None):
+    # trains embeddings for a corpus too large to pass to update_word_vectors
+    # as a string, always with negative sampling; returns word_to_vec.
+    # With checkpoint_dir the embeddings are saved there (save_embeddings)
+    # after every checkpoint_every iterations and at the end, and a run
+    # pointed at an existing checkpoint resumes from its iteration count up
+    # to iterations in total, reusing its vocabulary and initial vectors
+    root_seed = np.random.SeedSequence(seed)
+    if checkpoint_dir is not None and os.path.exists(os.path.join(checkpoint_dir, 'meta.json')):
+        checkpoint = load_embeddings(checkpoint_dir, mmap=False)
+        vocab, word_counts = checkpoint.words, checkpoint.word_counts
+        embeddings = np.array(checkpoint.vectors, dtype=np.float32)
+        pair_a, pair_b, pair_counts = count_cooccurrences(source, checkpoint.word_ids, window, chunk_size)
+        done = checkpoint.iteration
+    else:
+        vocab, word_counts, pair_a, pair_b, pair_counts = prepare_corpus(source, min_count, window, chunk_size)
+        rng = np.random.default_rng(np.random.SeedSequence(root_seed.entropy, spawn_key=(0,)))
+        embeddings = (2 * (rng.random((len(vocab), vector_length)) - .5)).astype(np.float32)
+        done = 0
+    pair_w = pair_counts.astype(np.float32)
+    while done < iterations:
+        steps = min(checkpoint_every or iterations, iterations - done)
+        # a seed per segment start keeps resumed runs reproducible
+        segment_seed = np.random.SeedSequence(root_seed.entropy, spawn_key=(1, done))
+        train_embeddings_parallel(embeddings, pair_a, pair_b, pair_w, learning_rate, steps, workers,
+                                  word_counts, negative_samples, penalty_rate, sampling_power,
+                                  segment_seed, start_iteration=done)
+        done += steps
+        if checkpoint_dir is not None:
+            save_embeddings(checkpoint_dir, vocab, embeddings, word_counts, done)
+    return {word: vec.tolist() for word, vec in zip(vocab, embeddings)}
+
+def _train_shard(matrix_path, shape, pair_a, pair_b, pair_w, learning_rate, iterations, start_iteration,
+                 normalize_rows, word_counts, negative_samples, penalty_rate, sampling_power, seed):
+    # worker side of train_embeddings_parallel: trains its share of the
+    # pairs directly on the shared memory-mapped matrix, without locks
+    embeddings = np.memmap(matrix_path, dtype=np.float32, mode='r+', shape=shape)
+    negative_sampler = None
+    if negative_samples:
+        negative_sampler = make_negative_sampler(word_counts, pair_a, pair_b, negative_samples,
+                                                 penalty_rate, sampling_power, seed)
+    # write only the rows this share touches: fewer races with the other
+    # workers and no O(V * d) pass over the shared matrix per iteration
+    train_embeddings(embeddings, pair_a, pair_b, pair_w, learning_rate, iterations, start_iteration,
+                     negative_sampler=negative_sampler, normalize_rows=normalize_rows, sparse_updates=True)
+    embeddings.flush()
+    return len(pair_a) * iterations
+
+def train_embeddings_parallel(embeddings:np.ndarray, pair_a:np.ndarray, pair_b:np.ndarray, pair_w:np.ndarray,
+                              learning_rate=0.001, iterations=10000, workers=None, word_counts=None,
+                              negative_samples=None, penalty_rate=2., sampling_power=0.75, seed=None,
+                              start_iteration=0):
+    # Hogwild-style training: the pairs are split into one interleaved share
+    # per worker process and every worker runs train_embeddings on its share
+    # against one shared memory-mapped copy of the matrix, with no locking
+    # (updates from different workers may race, which Hogwild tolerates).
+    # Each worker renormalizes only its own block of rows. Negative samples
+    # are drawn per worker from independent streams spawned from seed.
+    # workers=1 trains in process and matches train_embeddings exactly.
+    # Returns (embeddings, pairs trained per second)
+    workers = workers or os.cpu_count() or 1
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(workers)
+    start = time.perf_counter()
+    if workers == 1:
+        negative_sampler = None
+        if negative_samples:
+            negative_sampler = make_negative_sampler(word_counts, pair_a, pair_b, negative_samples,
+                                                     penalty_rate, sampling_power, seeds[0])
+        train_embeddings(embeddings, pair_a, pair_b, pair_w, learning_rate, iterations, start_iteration,
+                         negative_sampler=negative_sampler)
+        return embeddings, len(pair_a) * iterations / (time.perf_counter() - start)
+
+    row_bounds = np.linspace(0, len(embeddings), workers+1).astype(np.int64)
+    with tempfile.TemporaryDirectory() as tmp:
+        matrix_path = os.path.join(tmp, 'embeddings.f32')
+        shared = np.memmap(matrix_path, dtype=np.float32, mode='w+', shape=embeddings.shape)
+        shared[:] = embeddings
+        shared.flush()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_train_shard, matrix_path, embeddings.shape,
+                                   pair_a[i::workers], pair_b[i::workers], pair_w[i::workers],
+                                   learning_rate, iterations, start_iteration,
+                                   slice(row_bounds[i], row_bounds[i+1]),
+                                   word_counts, negative_samples, penalty_rate, sampling_power, seeds[i])
+                       for i in range(workers)]
+            pairs_trained = sum(future.result() for future in futures)
+        embeddings[:] = shared
+        del shared
+    return embeddings, pairs_trained / (time.perf_counter() - start)
+
+def update_word_vectors(word_to_vec, paragraph,learning_rate=0.001,iterations=10000,vector_length=VECTOR_LENGTH,penalty_rate=2.,debug = True,
+                        negative_samples=None, sampling_power=0.75, seed=None, workers=1):
+    # any word that is next to another in the paragraph is similar (its
+    # vector is pulled toward the pair's average), any word that is never
+    # next to the other is different (pushed away). Training runs on a
+    # (V, d) float32 matrix with integer word ids, see train_embeddings.
+    # With negative_samples=k, instead of pushing apart every unseen pair
+    # (O(V^2) per iteration) each seen pair pushes away k words drawn by
+    # frequency each iteration, so cost scales with the number of bigrams.
+    # workers > 1 trains with train_embeddings_parallel (no epoch printing)
+    vocab = list(word_to_vec.keys())
+    word_ids = {word: i for i, word in enumerate(vocab)}
+    embeddings = np.array([word_to_vec[word] for word in vocab], dtype=np.float32).reshape(len(vocab), vector_length)
+    words = paragraph.split()
+    seen_tuples = count_bigrams(words, word_ids)
+    if debug:
+        print(seen_tuples.values())
+    negative_sampler = None
+    word_counts = None
+    if negative_samples:
+        pair_a, pair_b, pair_w = build_seen_pairs(seen_tuples)
+        word_counts = np.bincount([word_ids[w] for w in words], minlength=len(vocab))
+        negative_sampler = make_negative_sampler(word_counts, pair_a, pair_b, negative_samples,
+                                                 penalty_rate, sampling_power, seed)
+    else:
+        pair_a, pair_b, pair_w = build_training_pairs(seen_tuples, len(vocab), penalty_rate)
+    if workers != 1:
+        train_embeddings_parallel(embeddings, pair_a, pair_b, pair_w, learning_rate, iterations, workers,
+                                  word_counts, negative_samples, penalty_rate, sampling_power, seed)
+        for word, vec in zip(vocab, embeddings):
+            word_to_vec[word] = vec.tolist()
+        return word_to_vec
+
+    def print_epoch(i, embeddings):
+        print(f'values at epoch {i} of training:')
+        for word, vec in zip(vocab, embeddings):
+            print(f'{word} = {vec.tolist()}')
+
+    train_embeddings(embeddings, pair_a, pair_b, pair_w, learning_rate, iterations,
+                     on_epoch=print_epoch if debug else None, negative_sampler=negative_sampler)
+    for word, vec in zip(vocab, embeddings):
+        word_to_vec[word] = vec.tolist()
     return word_to_vec
         
-word_to_vec = update_word_vectors(word_to_vec, paragraph,debug=False)
-print('values after training:')
-for word, vec in word_to_vec.items():
-    print(f'{word} = {vec}')
-print()
-print_most_similar_words(word_to_vec)
+class KeyedVectors(Mapping):
+    # read-only word_to_vec view over a (V, d) float32 matrix, usually
+    # memory-mapped by load_embeddings: kv[word] is a row view, no copies
+    def __init__(self, words, vectors, word_counts=None, iteration=0):
+        self.words = list(words)
+        self.word_ids = {word: i for i, word in enumerate(self.words)}
+        self.vectors = vectors
+        self.word_counts = word_counts
+        self.iteration = iteration
+
+    def __getitem__(self, word):
+        return self.vectors[self.word_ids[word]]
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+def save_embeddings(directory, vocab, embeddings, word_counts=None, iteration=0):
+    # compact binary format in directory: vectors-<tag>.npy (float32 V x d in
+    # vocab order), vocab-<tag>.txt (one word per line), counts-<tag>.npy
+    # (unigram counts, optional) and meta.json naming them. Each save writes
+    # files under a fresh tag and then renames meta.json over the old one, so
+    # the checkpoint switches in one step: a crash mid-save leaves the previous
+    # checkpoint whole. Files of earlier saves are removed after the switch;
+    # processes still mapping the old vectors keep their mapping
+    os.makedirs(directory, exist_ok=True)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    tag = f'{iteration}-{os.urandom(4).hex()}'
+    files = {'vectors': f'vectors-{tag}.npy', 'vocab': f'vocab-{tag}.txt'}
+    if word_counts is not None:
+        files['counts'] = f'counts-{tag}.npy'
+    meta = {'vocab_size': len(vocab), 'vector_length': embeddings.shape[1], 'iteration': iteration,
+            'files': files}
+
+    def write(name, contents):
+        with open(os.path.join(directory, name), 'wb') as f:
+            contents(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    write(files['vectors'], lambda f: np.save(f, embeddings))
+    write(files['vocab'], lambda f: f.write(''.join(f'{word}\n' for word in vocab).encode('utf-8')))
+    if word_counts is not None:
+        write(files['counts'], lambda f: np.save(f, np.asarray(word_counts, dtype=np.int64)))
+    write('meta.json.tmp', lambda f: f.write(json.dumps(meta).encode('utf-8')))
+    os.replace(os.path.join(directory, 'meta.json.tmp'), os.path.join(directory, 'meta.json'))
+    for name in os.listdir(directory):
+        stem = name.split('-', 1)[0]
+        if stem in ('vectors', 'vocab', 'counts') and '-' in name and name not in files.values():
+            os.remove(os.path.join(directory, name))
+
+def load_embeddings(directory, mmap=True):
+    # load a directory written by save_embeddings as KeyedVectors; with
+    # mmap the matrix is mapped read-only instead of read, so loading is
+    # instant and every process mapping it shares one copy in the page cache
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    # checkpoints from before versioned file names use the plain ones
+    files = meta.get('files', {'vectors': 'vectors.npy', 'vocab': 'vocab.txt', 'counts': 'counts.npy'})
+    vectors = np.load(os.path.join(directory, files['vectors']), mmap_mode='r' if mmap else None)
+    with open(os.path.join(directory, files['vocab']), encoding='utf-8') as f:
+        words = f.read().split('\n')[:meta['vocab_size']]
+    counts_path = os.path.join(directory, files['counts']) if 'counts' in files else None
+    word_counts = np.load(counts_path) if counts_path and os.path.exists(counts_path) else None
+    return KeyedVectors(words, vectors, word_counts, meta['iteration'])
+
+if __name__ == '__main__':
+    #randomize our word_to_vec dictionary
+    word_to_vec = dict()
+    for word in paragraph.split():
+        if word not in word_to_vec:
+            word_to_vec[word] = [2 * (np.random.random(1)-.5)[0] for _ in range(VECTOR_LENGTH)]
+
+    print('randomized initial values:')
+    for word, vec in word_to_vec.items():
+        print(f'{word} = {vec}')
+    print()
+
+    word_to_vec = update_word_vectors(word_to_vec, paragraph,debug=False)
+    print('values after training:')
+    for word, vec in word_to_vec.items():
+        print(f'{word} = {vec}')
+    print()
+    print_most_similar_words(word_to_vec)
 